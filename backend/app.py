@@ -1,13 +1,16 @@
 
 import os
 from pathlib import Path
-from transformers import pipeline
 import sys
-from flask import Flask, request, jsonify
+import time
+from flask import Flask, request, jsonify, Response, g
 from flask_cors import CORS
 import logging
-import re
-from collections import Counter
+from term_stats import term_counts, workspace_keywords
+from metrics import timed, count_model_call, render_metrics, CONTENT_TYPE, start_request_breakdown, finish_request_breakdown
+from profiling import profile_capture, timing_requested, PROFILE_FILENAME
+from inference import load_pipeline, backend_for
+from doc_tags import DocumentTagCache, TagScoringWorker, score_chunks, aggregate_tags
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -21,28 +24,34 @@ qa_pipeline = None
 feature_extraction_pipeline = None
 zero_shot_classifier = None
 
+# Tag scores per (workspace, file), reused until the file changes
+document_tag_cache = DocumentTagCache()
+
 def initialize_models():
     global qa_pipeline, feature_extraction_pipeline, zero_shot_classifier
     try:
         # Initialize QA pipeline with a more reliable model
-        qa_pipeline = pipeline(
+        qa_pipeline = load_pipeline(
             "question-answering", 
-            model="distilbert-base-cased-distilled-squad",
+            "distilbert-base-cased-distilled-squad",
+            backend=backend_for("qa"),
             tokenizer="distilbert-base-cased-distilled-squad"
         )
         logger.info("QA pipeline initialized successfully")
         
         # Initialize feature extraction for AI linker
-        feature_extraction_pipeline = pipeline(
+        feature_extraction_pipeline = load_pipeline(
             "feature-extraction",
-            model="sentence-transformers/all-MiniLM-L6-v2"
+            "sentence-transformers/all-MiniLM-L6-v2",
+            backend=backend_for("embedding")
         )
         logger.info("Feature extraction pipeline initialized successfully")
         
         # Initialize zero-shot classification for auto-tagging
-        zero_shot_classifier = pipeline(
+        zero_shot_classifier = load_pipeline(
             "zero-shot-classification",
-            model="facebook/bart-large-mnli"
+            "facebook/bart-large-mnli",
+            backend=backend_for("zero_shot")
         )
         logger.info("Zero-shot classifier initialized successfully")
         
@@ -58,6 +67,26 @@ initialize_models()
 app = Flask(__name__)
 CORS(app)
 
+@app.before_request
+def start_request_instrumentation():
+    if timing_requested(request.headers, request.args):
+        g.timing_token = start_request_breakdown()
+    if request.url_rule is not None:
+        g.profile = profile_capture.start(request.url_rule.rule)
+
+@app.after_request
+def add_server_timing(response):
+    token = g.pop('timing_token', None)
+    if token is not None:
+        response.headers['Server-Timing'] = finish_request_breakdown(token)
+    return response
+
+@app.teardown_request
+def stop_request_profiling(exc):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile_capture.finish(request.url_rule.rule, profile)
+
 def ensure_workspace(workspace_name):
     safe_workspace_name = ''.join(c for c in workspace_name if c.isalnum() or c in ('-', '_')).rstrip()
     if not safe_workspace_name:
@@ -67,35 +96,42 @@ def ensure_workspace(workspace_name):
     return path
 
 def load_workspace_content(workspace_path):
+    with timed("file_loading"):
+        return _load_workspace_content(workspace_path)
+
+def _load_workspace_content(workspace_path):
     content = ""
-    logger.info(f"Scanning workspace: {workspace_path}")
+    logger.debug("Scanning workspace: %s", workspace_path)
     
     if not workspace_path.exists():
         logger.warning(f"Workspace not found: {workspace_path}")
         return ""
         
     for file in workspace_path.iterdir():
-        logger.info(f"Checking file: {file.name}")
         if file.is_file() and file.suffix.lower() in [".txt", ".md"]:
             try:
                 with open(file, "r", encoding="utf-8") as f:
                     file_content = f.read()
-                    logger.info(f"Loaded {file.name} ({len(file_content)} characters)")
+                    logger.debug("Loaded %s (%d characters)", file.name, len(file_content))
                     content += f"\n\n--- {file.name} ---\n{file_content}"
             except Exception as e:
                 logger.error(f"Failed to read file {file.name}: {e}")
         else:
-            logger.info(f"Ignored {file.name} (unsupported extension)")
+            logger.debug("Ignored %s (unsupported extension)", file.name)
     
     if not content:
         logger.warning("No readable content found in workspace.")
     else:
-        logger.info(f"Total content loaded: {len(content)} characters")
+        logger.debug("Total content loaded: %d characters", len(content))
     
     return content
 
 def split_text(text, max_length=512, overlap=50):
     """Split text into overlapping chunks for better context preservation"""
+    with timed("chunking"):
+        return _split_text(text, max_length, overlap)
+
+def _split_text(text, max_length, overlap):
     if not text:
         return []
     
@@ -120,22 +156,69 @@ def split_text(text, max_length=512, overlap=50):
 
 def extract_keywords(text, max_keywords=10):
     """Extract important keywords from text for better tag suggestions"""
-    # Remove special characters and convert to lowercase
-    cleaned_text = re.sub(r'[^\w\s]', ' ', text.lower())
-    words = cleaned_text.split()
-    
-    # Filter out common stop words
-    stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him', 'her', 'us', 'them'}
-    
-    # Filter words longer than 3 characters and not in stop words
-    filtered_words = [word for word in words if len(word) > 3 and word not in stop_words]
-    
-    # Count word frequency
-    word_counts = Counter(filtered_words)
+    word_counts = term_counts(text)
     
     # Return most common words as keywords
     return [word for word, count in word_counts.most_common(max_keywords)]
 
+def classification_chunks(content):
+    """Chunks of a document that the tagger classifies (first 5, skipping very short ones)"""
+    chunks = split_text(content, max_length=400)
+    return [chunk for chunk in chunks[:5] if len(chunk.split()) >= 10]
+
+def document_version(stat):
+    return (stat.st_mtime_ns, stat.st_size)
+
+def score_document_tags(file):
+    """Classify a workspace file in the tag scoring worker, unless this version is already scored"""
+    try:
+        stat = file.stat()
+        key = (str(file.parent), file.name)
+        version = document_version(stat)
+        if document_tag_cache.get(key, version) is not None:
+            return
+        with open(file, "r", encoding="utf-8") as f:
+            file_content = f.read()
+    except FileNotFoundError:
+        return  # Deleted before its turn
+    document_tag_cache.put(key, version, score_chunks(zero_shot_classifier, classification_chunks(file_content)))
+
+tag_scoring = TagScoringWorker(score_document_tags)
+
+def queue_tag_scoring(file):
+    if zero_shot_classifier is not None:
+        tag_scoring.submit((str(file.parent), file.name), file)
+
+def workspace_document_tags(workspace_path):
+    """Collect (tag_scores, length, mtime) per scored document.
+
+    Scores come from the tag scoring worker; new or changed documents without
+    scores for their current version are queued for it and counted as pending.
+    No file is read here.
+    """
+    documents = []
+    pending = 0
+    live_keys = set()
+    
+    for file in workspace_path.iterdir():
+        if not (file.is_file() and file.suffix.lower() in [".txt", ".md"]):
+            continue
+        
+        stat = file.stat()
+        key = (str(workspace_path), file.name)
+        live_keys.add(key)
+        
+        tag_scores = document_tag_cache.get(key, document_version(stat))
+        if tag_scores is None:
+            queue_tag_scoring(file)
+            pending += 1
+            continue
+        
+        documents.append((tag_scores, stat.st_size, stat.st_mtime))
+    
+    document_tag_cache.prune(str(workspace_path), live_keys)
+    return documents, pending
+
 def generate_auto_tags(workspace_name, file_content=None):
     """Generate automatic tags for workspace content or specific file"""
     try:
@@ -145,62 +228,29 @@ def generate_auto_tags(workspace_name, file_content=None):
         workspace_path = ensure_workspace(workspace_name)
         
         if file_content:
-            content = file_content
+            if not file_content.strip():
+                return {"tags": [], "message": "No content found to analyze"}
+            
+            chunks = classification_chunks(file_content)
+            documents = [(score_chunks(zero_shot_classifier, chunks), len(file_content), time.time())]
+            keywords = extract_keywords(file_content)
+            stats = {"total_content_length": len(file_content), "chunks_analyzed": len(chunks)}
         else:
-            content = load_workspace_content(workspace_path)
-        
-        if not content.strip():
-            return {"tags": [], "message": "No content found to analyze"}
-        
-        # Predefined tag categories
-        candidate_labels = [
-            "meeting", "strategy", "research", "todo", "idea", "project", "documentation",
-            "notes", "planning", "brainstorming", "analysis", "report", "presentation",
-            "technical", "business", "creative", "personal", "urgent", "completed",
-            "in-progress", "review", "collaboration", "learning", "reference"
-        ]
-        
-        # Extract keywords for additional context
-        keywords = extract_keywords(content)
-        
-        # Split content into manageable chunks
-        chunks = split_text(content, max_length=400)
-        
-        all_tags = []
-        tag_confidence = {}
-        
-        for chunk in chunks[:5]:  # Analyze first 5 chunks to avoid overwhelming the model
-            if len(chunk.split()) < 10:  # Skip very short chunks
-                continue
-                
-            try:
-                result = zero_shot_classifier(chunk, candidate_labels)
-                
-                # Filter tags with confidence > 0.3
-                for label, score in zip(result['labels'], result['scores']):
-                    if score > 0.3:
-                        if label not in tag_confidence:
-                            tag_confidence[label] = []
-                        tag_confidence[label].append(score)
-                        
-            except Exception as e:
-                logger.error(f"Error processing chunk: {e}")
-                continue
-        
-        # Average confidence scores and select top tags
-        final_tags = []
-        for tag, scores in tag_confidence.items():
-            avg_confidence = sum(scores) / len(scores)
-            if avg_confidence > 0.4:  # Higher threshold for final selection
-                final_tags.append({
-                    "name": tag,
-                    "confidence": round(avg_confidence, 3),
-                    "auto_generated": True
-                })
+            # Workspace tags aggregate the per-document scores stored by the tag scoring worker
+            documents, pending = workspace_document_tags(workspace_path)
+            total_length = sum(length for _, length, _ in documents)
+            if not total_length and not pending:
+                return {"tags": [], "message": "No content found to analyze"}
+            
+            # Workspace keywords come from cached per-file counts
+            keywords = [term for score, term in workspace_keywords(workspace_path)[0]]
+            stats = {
+                "total_content_length": total_length,
+                "documents_analyzed": len(documents),
+                "documents_pending": pending
+            }
         
-        # Sort by confidence and take top 10
-        final_tags.sort(key=lambda x: x['confidence'], reverse=True)
-        final_tags = final_tags[:10]
+        final_tags = aggregate_tags(documents)
         
         # Add keyword-based tags if we have few auto-generated tags
         if len(final_tags) < 5 and keywords:
@@ -217,8 +267,7 @@ def generate_auto_tags(workspace_name, file_content=None):
         return {
             "tags": final_tags,
             "keywords": keywords[:5],
-            "total_content_length": len(content),
-            "chunks_analyzed": min(len(chunks), 5)
+            **stats
         }
         
     except Exception as e:
@@ -254,8 +303,10 @@ def answer_question_from_workspace(workspace_name, question):
             if len(chunk.split()) < 5:
                 continue
                 
-            result = qa_pipeline(question=question, context=chunk)
-            logger.info(f"Chunk {i+1}: Score {result['score']:.3f}, Answer: {result['answer'][:100]}...")
+            count_model_call("qa", chunk)
+            with timed("qa_inference"):
+                result = qa_pipeline(question=question, context=chunk)
+            logger.debug("Chunk %d: Score %.3f, Answer: %.100s...", i + 1, result['score'], result['answer'])
             
             if result["score"] > best_answer["score"]:
                 best_answer = result
@@ -285,30 +336,31 @@ def extract_document_links(workspace_name, current_text):
         documents = content.split("--- ")
         document_suggestions = []
         
-        for doc in documents[1:]:  # Skip first empty element
-            if not doc.strip():
-                continue
+        with timed("index_search"):
+            for doc in documents[1:]:  # Skip first empty element
+                if not doc.strip():
+                    continue
+                    
+                lines = doc.split("\n")
+                doc_name = lines[0].replace(" ---", "").strip()
+                doc_content = "\n".join(lines[1:])
                 
-            lines = doc.split("\n")
-            doc_name = lines[0].replace(" ---", "").strip()
-            doc_content = "\n".join(lines[1:])
-            
-            # Simple keyword matching for demonstration
-            # In production, you'd use more sophisticated NLP
-            keywords = current_text.lower().split()
-            doc_lower = doc_content.lower()
-            
-            relevance_score = sum(1 for keyword in keywords if keyword in doc_lower)
-            
-            if relevance_score > 0:
-                document_suggestions.append({
-                    "id": doc_name.replace(" ", "_"),
-                    "targetPage": doc_name,
-                    "confidence": min(relevance_score / len(keywords), 1.0),
-                    "reason": f"Found {relevance_score} relevant keywords",
-                    "preview": doc_content[:150] + "..." if len(doc_content) > 150 else doc_content,
-                    "type": "semantic" if relevance_score > 2 else "contextual"
-                })
+                # Simple keyword matching for demonstration
+                # In production, you'd use more sophisticated NLP
+                keywords = current_text.lower().split()
+                doc_lower = doc_content.lower()
+                
+                relevance_score = sum(1 for keyword in keywords if keyword in doc_lower)
+                
+                if relevance_score > 0:
+                    document_suggestions.append({
+                        "id": doc_name.replace(" ", "_"),
+                        "targetPage": doc_name,
+                        "confidence": min(relevance_score / len(keywords), 1.0),
+                        "reason": f"Found {relevance_score} relevant keywords",
+                        "preview": doc_content[:150] + "..." if len(doc_content) > 150 else doc_content,
+                        "type": "semantic" if relevance_score > 2 else "contextual"
+                    })
         
         # Sort by confidence and return top 5
         document_suggestions.sort(key=lambda x: x["confidence"], reverse=True)
@@ -322,6 +374,44 @@ def extract_document_links(workspace_name, current_text):
 def index():
     return "Flask backend for AI features is running!"
 
+@app.route('/metrics')
+def metrics():
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
+
+@app.route('/admin/profile', methods=['POST'])
+def arm_profiling():
+    """Capture a cProfile for the next N requests to a route (e.g. /ask)"""
+    try:
+        data = request.json
+        route = data.get('route')
+        requests_to_capture = int(data.get('requests', 1))
+
+        if not route or requests_to_capture < 1:
+            return jsonify({'error': 'Missing route or invalid request count'}), 400
+
+        profile_capture.arm(route, requests_to_capture)
+        return jsonify(profile_capture.status(route)), 201
+    
+    except Exception as e:
+        logger.error(f"Error arming profiler: {e}")
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+@app.route('/admin/profile', methods=['GET'])
+def download_profile():
+    """Download the captured profile for a route as a pstats file once all requests were captured"""
+    route = request.args.get('route')
+    status = profile_capture.status(route) if route else None
+    if status is None:
+        return jsonify({'error': 'No profile armed for this route'}), 404
+    if not status['done']:
+        return jsonify(status), 202
+    
+    return Response(
+        profile_capture.dump(route),
+        mimetype='application/octet-stream',
+        headers={'Content-Disposition': f'attachment; filename={PROFILE_FILENAME}'}
+    )
+
 @app.route('/ask', methods=['POST'])
 def ask_question():
     try:
@@ -379,6 +469,26 @@ def extract_links():
         logger.error(f"Error in extract_links: {e}")
         return jsonify({'error': 'An unexpected error occurred'}), 500
 
+@app.route('/keywords/<workspace_name>', methods=['GET'])
+def get_workspace_keywords(workspace_name):
+    """Get TF-IDF ranked keywords for a workspace"""
+    try:
+        workspace_path = ensure_workspace(workspace_name)
+        max_keywords = request.args.get('limit', 10, type=int)
+        if max_keywords < 1:
+            return jsonify({'error': 'Invalid limit'}), 400
+
+        ranked, num_docs = workspace_keywords(workspace_path, max_keywords)
+        keywords = [{"term": term, "score": round(score, 3)} for score, term in ranked]
+        
+        return jsonify({'keywords': keywords, 'documents': num_docs})
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting workspace keywords: {e}")
+        return jsonify({'error': 'Failed to get workspace keywords'}), 500
+
 @app.route('/create_workspace', methods=['POST'])
 def create_workspace():
     try:
@@ -425,6 +535,7 @@ def upload_file(workspace_name):
             filename = file.filename
             file_path = workspace_path / filename
             file.save(file_path)
+            queue_tag_scoring(file_path)
             logger.info(f"File '{filename}' uploaded successfully to '{safe_workspace_name}'")
             return jsonify({'message': f'File \'{filename}\' uploaded successfully to \'{safe_workspace_name}\''}), 201
             
@@ -0,0 +1,80 @@
+import math
+import random
+from itertools import accumulate
+
+TOPICS = {
+    "engineering": ["deploy", "latency", "service", "database", "migration", "cache", "pipeline", "release", "incident", "rollback", "schema", "endpoint", "cluster", "monitoring", "refactor"],
+    "meetings": ["agenda", "attendees", "decision", "action", "followup", "minutes", "standup", "retro", "sync", "owner", "deadline", "discussion", "summary", "notes", "review"],
+    "research": ["hypothesis", "experiment", "dataset", "results", "baseline", "evaluation", "paper", "analysis", "metric", "sample", "model", "accuracy", "finding", "method", "survey"],
+    "business": ["revenue", "customer", "strategy", "market", "pricing", "quarter", "budget", "forecast", "growth", "partner", "contract", "launch", "roadmap", "target", "sales"],
+    "personal": ["journal", "travel", "recipe", "workout", "reading", "habit", "weekend", "family", "goals", "ideas", "shopping", "garden", "movie", "music", "health"],
+}
+
+COMMON_WORDS = ["the", "a", "and", "of", "to", "in", "is", "for", "on", "with", "we", "this", "that", "it", "are", "be", "will", "should", "next", "team", "project", "plan", "week", "update", "work"]
+
+
+# Weight the i-th topic word by 1/(i+1) so a few terms dominate, as in real notes
+TOPIC_CUM_WEIGHTS = {topic: list(accumulate(1.0 / (i + 1) for i in range(len(words)))) for topic, words in TOPICS.items()}
+
+
+def generate_page(rng, index, min_words=20, max_words=5000):
+    """Generate one synthetic page with a topic-skewed vocabulary and a log-normal length"""
+    topic = rng.choice(sorted(TOPICS))
+    vocabulary = TOPICS[topic]
+    length = int(min(max(rng.lognormvariate(math.log(300), 0.9), min_words), max_words))
+
+    sentences = []
+    words_left = length
+    while words_left > 0:
+        sentence_length = min(rng.randint(6, 18), words_left)
+        words = [
+            rng.choices(vocabulary, cum_weights=TOPIC_CUM_WEIGHTS[topic])[0] if rng.random() < 0.4 else rng.choice(COMMON_WORDS)
+            for _ in range(sentence_length)
+        ]
+        sentences.append(" ".join(words).capitalize() + ".")
+        words_left -= sentence_length
+
+    return {
+        "title": f"{topic.title()} note {index}",
+        "content": " ".join(sentences),
+        "topic": topic,
+    }
+
+
+def generate_corpus(num_pages, seed=0, duplicate_ratio=0.05):
+    """Generate num_pages synthetic pages; a fraction are lightly edited copies of earlier pages"""
+    rng = random.Random(seed)
+    pages = []
+    for i in range(num_pages):
+        if pages and rng.random() < duplicate_ratio:
+            original = rng.choice(pages)
+            pages.append({
+                "title": f"{original['title']} (copy {i})",
+                "content": original["content"] + " " + rng.choice(COMMON_WORDS).capitalize() + ".",
+                "topic": original["topic"],
+            })
+        else:
+            pages.append(generate_page(rng, i))
+    return pages
+
+
+def generate_queries(num_queries, seed=0):
+    """Generate questions and link-lookup texts drawn from the corpus vocabulary"""
+    rng = random.Random(seed + 1)
+    queries = []
+    for _ in range(num_queries):
+        topic = rng.choice(sorted(TOPICS))
+        word = rng.choice(TOPICS[topic])
+        other = rng.choice(TOPICS[topic])
+        queries.append({
+            "question": f"What is the {word} {other} plan?",
+            "text": f"We discussed the {word} and {other} for the {rng.choice(COMMON_WORDS[-8:])}",
+        })
+    return queries
+
+
+def write_workspace(pages, workspace_path):
+    """Write pages as markdown files, the layout the Flask app reads from disk"""
+    workspace_path.mkdir(parents=True, exist_ok=True)
+    for i, page in enumerate(pages):
+        (workspace_path / f"page_{i:06d}.md").write_text(f"# {page['title']}\n\n{page['content']}\n", encoding="utf-8")
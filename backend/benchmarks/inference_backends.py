@@ -0,0 +1,154 @@
+"""Compare inference backends (torch / int8 / onnx) for each model.
+
+Reports load time, resident memory added by the model, per-call latency and
+agreement with the float32 torch reference: exact answer match for QA, top-1
+and top-3 tag agreement for zero-shot, and cosine drift for embeddings.
+
+Needs the real models in the local Hugging Face cache (and
+optimum[onnxruntime] for the onnx backend).
+
+Usage (from backend/):
+    python -m benchmarks.inference_backends --backends torch,int8,onnx --samples 50 --output backends.json
+"""
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.corpus import generate_corpus, generate_queries
+from benchmarks.run import BACKEND_DIR, current_rss_mb, git_commit, percentile
+
+MODELS = {
+    "qa": ("question-answering", "deepset/roberta-base-squad2"),  # FastAPI app
+    "qa_flask": ("question-answering", "distilbert-base-cased-distilled-squad"),  # Flask app
+    "zero_shot": ("zero-shot-classification", "facebook/bart-large-mnli"),
+    "embedding": (None, "all-MiniLM-L6-v2"),
+}
+
+
+def load_samples(num_samples, seed, workspace=None):
+    """Contexts from a real workspace directory if given, otherwise from the synthetic corpus"""
+    if workspace:
+        texts = [file.read_text(encoding="utf-8") for file in sorted(Path(workspace).iterdir())
+                 if file.is_file() and file.suffix.lower() in [".txt", ".md"]]
+    else:
+        texts = [page["content"] for page in generate_corpus(num_samples, seed=seed)]
+    # Keep contexts within a single model window, as the apps' chunking does
+    contexts = [" ".join(text.split()[:300]) for text in texts if text.strip()][:num_samples]
+    queries = generate_queries(len(contexts), seed=seed)
+    return [{"context": context, "question": query["question"]} for context, query in zip(contexts, queries)]
+
+
+def load_runner(model_key, backend):
+    """Load a model on a backend and return a function mapping a sample to a comparable output"""
+    from inference import load_pipeline, load_sentence_transformer
+    from doc_tags import CANDIDATE_LABELS
+
+    task, model_name = MODELS[model_key]
+    if model_key == "embedding":
+        model = load_sentence_transformer(model_name, backend=backend)
+        return lambda sample: np.asarray(model.encode(sample["context"]), dtype=np.float32)
+
+    pipe = load_pipeline(task, model_name, backend=backend)
+    if task == "question-answering":
+        return lambda sample: pipe(question=sample["question"], context=sample["context"])["answer"].strip()
+    return lambda sample: pipe(sample["context"], CANDIDATE_LABELS)["labels"][:3]
+
+
+def agreement(model_key, reference, outputs):
+    if MODELS[model_key][0] == "question-answering":
+        return {"answer_agreement": round(float(np.mean([a == b for a, b in zip(reference, outputs)])), 4)}
+    if model_key == "zero_shot":
+        return {
+            "top1_tag_agreement": round(float(np.mean([a[0] == b[0] for a, b in zip(reference, outputs)])), 4),
+            "top3_tag_overlap": round(float(np.mean([len(set(a) & set(b)) / 3 for a, b in zip(reference, outputs)])), 4),
+        }
+    drift = [
+        1.0 - float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+        for a, b in zip(reference, outputs)
+    ]
+    return {"mean_cosine_drift": round(float(np.mean(drift)), 6), "max_cosine_drift": round(float(np.max(drift)), 6)}
+
+
+def benchmark_backend(model_key, backend, samples):
+    gc.collect()
+    rss_before = current_rss_mb()
+    load_start = time.perf_counter()
+    runner = load_runner(model_key, backend)
+    load_seconds = time.perf_counter() - load_start
+    rss_after = current_rss_mb()
+
+    runner(samples[0])  # Warm-up
+    outputs, latencies = [], []
+    for sample in samples:
+        start = time.perf_counter()
+        outputs.append(runner(sample))
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    del runner
+    gc.collect()
+
+    result = {
+        "model": model_key,
+        "backend": backend,
+        "load_seconds": round(load_seconds, 2),
+        "rss_delta_mb": round(rss_after - rss_before, 1),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+    }
+    print(f"{model_key:10} {backend:6} p50={result['p50_ms']:>9}ms rss+={result['rss_delta_mb']}MB", file=sys.stderr)
+    return result, outputs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare torch, int8 and ONNX Runtime backends per model")
+    parser.add_argument("--models", default=",".join(MODELS), help=f"comma-separated subset of {','.join(MODELS)}")
+    parser.add_argument("--backends", default="torch,int8,onnx", help="backends to compare against the torch reference")
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workspace", help="directory of .txt/.md files to sample contexts from instead of the synthetic corpus")
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    samples = load_samples(args.samples, args.seed, args.workspace)
+    backends = [backend for backend in args.backends.split(",") if backend and backend != "torch"]
+    if "onnx" in backends and importlib.util.find_spec("optimum") is None:
+        # load_pipeline would silently fall back to torch and mislabel the results
+        print("optimum[onnxruntime] is not installed, skipping the onnx backend", file=sys.stderr)
+        backends.remove("onnx")
+
+    results = []
+    for model_key in [key for key in args.models.split(",") if key]:
+        reference_result, reference = benchmark_backend(model_key, "torch", samples)
+        results.append(reference_result)
+        for backend in backends:
+            result, outputs = benchmark_backend(model_key, backend, samples)
+            result.update(agreement(model_key, reference, outputs))
+            result["speedup_vs_torch"] = round(reference_result["p50_ms"] / result["p50_ms"], 2) if result["p50_ms"] else None
+            results.append(result)
+
+    report = {
+        "meta": {"commit": git_commit(), "samples": len(samples), "source": args.workspace or "synthetic"},
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""Offline benchmark for the Flask and FastAPI backends.
+
+Generates a synthetic workspace, drives every endpoint of both apps in-process
+and writes throughput, latency percentiles, the resident memory each endpoint
+added and the run's peak RSS as JSON.
+
+Usage (from backend/, with requirements_bench.txt installed):
+    python -m benchmarks.run --pages 1000 --models stub --output bench.json
+
+Stub runs need no torch, transformers or sentence-transformers; --models real
+needs the full app requirements and the models in the local cache.
+"""
+import argparse
+import importlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.corpus import generate_corpus, generate_queries, write_workspace
+from benchmarks.stub_models import install_stub_models
+
+BACKEND_DIR = Path(__file__).parent.parent.absolute()
+WORKSPACE = "bench"
+UPLOAD_WORKSPACE = "bench-upload"
+PROFILED_ROUTE = "/"  # cheap route used to exercise the /admin/profile endpoints
+APP_MODULES = {"flask": "app", "fastapi": "fastapi_app"}
+ERROR_ANSWER_PREFIX = "Sorry, I encountered an error"
+
+
+def load_apps(apps, models):
+    """Import the requested apps, with stub models or with real models restricted to the local cache"""
+    if models == "stub":
+        install_stub_models()
+    else:
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+    # Imported after the stubs are installed so it binds the patched constructors
+    sys.path.insert(0, str(BACKEND_DIR))
+    import inference
+    if models == "stub":
+        # Quantization and ONNX only apply to real models
+        for key in inference.MODEL_KEYS:
+            os.environ[f"KNOWAI_{key.upper()}_BACKEND"] = "torch"
+
+    modules = {name: importlib.import_module(APP_MODULES[name]) for name in apps}
+
+    if models == "real" and any(module.qa_pipeline is None for module in modules.values()):
+        raise SystemExit("Real models are not available in the local cache; run with --models stub")
+    return modules
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def current_rss_mb():
+    """Current resident set size (falls back to peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def is_error(response):
+    """Both apps report most failures as 200 with an error body, so check the body as well as the status"""
+    if response.status_code >= 400:
+        return True
+    try:
+        # Flask test responses expose get_json(); httpx responses raise on non-JSON bodies
+        body = response.get_json(silent=True) if hasattr(response, "get_json") else response.json()
+    except ValueError:
+        return False
+    if not isinstance(body, dict):
+        return False
+    return "error" in body or str(body.get("answer", "")).startswith(ERROR_ANSWER_PREFIX)
+
+
+def measure(app_name, endpoint, call, iterations, warmup=1):
+    """Call an endpoint `iterations` times and summarize its latency distribution"""
+    rss_before = current_rss_mb()
+    for i in range(min(warmup, iterations)):
+        call(i)
+
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    for i in range(iterations):
+        call_start = time.perf_counter()
+        response = call(i)
+        latencies.append((time.perf_counter() - call_start) * 1000)
+        if is_error(response):
+            errors += 1
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    result = {
+        "app": app_name,
+        "endpoint": endpoint,
+        "requests": iterations,
+        "errors": errors,
+        "throughput_rps": round(iterations / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "rss_delta_mb": round(current_rss_mb() - rss_before, 1),
+    }
+    print(f"{app_name:8} {endpoint:40} p50={result['p50_ms']:>9}ms p95={result['p95_ms']:>9}ms rps={result['throughput_rps']}", file=sys.stderr)
+    return result
+
+
+def skipped(app_name, endpoint, reason):
+    print(f"{app_name:8} {endpoint:40} skipped ({reason})", file=sys.stderr)
+    return {"app": app_name, "endpoint": endpoint, "skipped": reason}
+
+
+def capture_profile(client, arm_profile):
+    """Arm a one-request capture of PROFILED_ROUTE and run that request, so the profile is ready to download"""
+    arm_profile()
+    client.get(PROFILED_ROUTE)
+
+
+def score_workspace_tags(app_module, generate_tags):
+    """Queue every document for tag scoring and wait, so the measured requests aggregate a fully scored workspace"""
+    generate_tags(0)
+    app_module.tag_scoring.join()
+
+
+def run_flask(flask_module, corpus, queries, args, selected):
+    client = flask_module.app.test_client()
+    results = []
+
+    with tempfile.TemporaryDirectory() as root:
+        # Point the app at a scratch project root so the real workspaces/ are untouched
+        flask_module.PROJECT_ROOT = Path(root)
+        write_workspace(corpus, Path(root) / "workspaces" / WORKSPACE)
+        (Path(root) / "workspaces" / UPLOAD_WORKSPACE).mkdir(parents=True)
+
+        def arm_profile(i=0):
+            return client.post("/admin/profile", json={"route": PROFILED_ROUTE, "requests": 1})
+
+        scenarios = [
+            ("GET /", lambda i: client.get("/")),
+            ("GET /workspaces", lambda i: client.get("/workspaces")),
+            ("POST /create_workspace", lambda i: client.post("/create_workspace", json={"workspace": f"bench-new-{i}"})),
+            ("POST /upload_file/{workspace}", lambda i: client.post(
+                f"/upload_file/{UPLOAD_WORKSPACE}",
+                data={"file": (io.BytesIO(corpus[i % len(corpus)]["content"].encode("utf-8")), f"upload_{i}.md")}
+            )),
+            ("GET /workspace_documents/{workspace}", lambda i: client.get(f"/workspace_documents/{WORKSPACE}")),
+            ("GET /keywords/{workspace}", lambda i: client.get(f"/keywords/{WORKSPACE}")),
+            ("POST /extract_links", lambda i: client.post("/extract_links", json={"workspace": WORKSPACE, "text": queries[i % len(queries)]["text"]})),
+            ("POST /generate_tags", lambda i: client.post("/generate_tags", json={"workspace": WORKSPACE})),
+            ("POST /ask", lambda i: client.post("/ask", json={"workspace": WORKSPACE, "question": queries[i % len(queries)]["question"]})),
+            ("GET /metrics", lambda i: client.get("/metrics")),
+            ("POST /admin/profile", arm_profile),
+            ("GET /admin/profile", lambda i: client.get("/admin/profile", query_string={"route": PROFILED_ROUTE})),
+        ]
+        for endpoint, call in scenarios:
+            if not selected(endpoint):
+                continue
+            if endpoint == "GET /admin/profile":
+                capture_profile(client, arm_profile)
+            if endpoint == "POST /generate_tags":
+                score_workspace_tags(flask_module, call)
+            results.append(measure("flask", endpoint, call, args.iterations, args.warmup))
+
+    return results
+
+
+def run_fastapi(fastapi_module, corpus, queries, args, selected):
+    from fastapi.testclient import TestClient
+
+    client = TestClient(fastapi_module.app)
+    results = []
+
+    # Ingest is always run (the other endpoints need the pages), but only reported if selected
+    page_ids = []
+
+    def add_page(i):
+        page = corpus[i]
+        response = client.post("/add_page", json={"title": page["title"], "content": page["content"], "workspace": WORKSPACE})
+        page_ids.append(response.json().get("page_id"))
+        return response
+
+    ingest = measure("fastapi", "POST /add_page", add_page, len(corpus), warmup=0)
+    if selected("POST /add_page"):
+        results.append(ingest)
+
+    uploaded = []
+
+    def upload_file(i):
+        content = corpus[i % len(corpus)]["content"].encode("utf-8")
+        response = client.post(f"/upload_file/{UPLOAD_WORKSPACE}", files={"file": (f"upload_{i}.md", content, "text/markdown")})
+        uploaded.append(response.json().get("page_id"))
+        return response
+
+    def arm_profile(i=0):
+        return client.post("/admin/profile", json={"route": PROFILED_ROUTE, "requests": 1})
+
+    tagged_title = corpus[0]["title"]  # page_ids[0] is tagged "benchmark" by PUT /update_page
+
+    scenarios = [
+        ("GET /", lambda i: client.get("/")),
+        ("GET /workspaces", lambda i: client.get("/workspaces")),
+        ("POST /create_workspace", lambda i: client.post("/create_workspace", data={"workspace_name": f"bench-new-{i}"})),
+        ("POST /upload_file/{workspace}", upload_file),
+        ("PUT /update_page", lambda i: client.put("/update_page", json={
+            "page_id": page_ids[i % len(page_ids)], "title": None, "content": None, "tags": ["benchmark"]
+        })),
+        ("GET /list_pages/{workspace}", lambda i: client.get(f"/list_pages/{WORKSPACE}")),
+        ("GET /list_pages/{workspace}?tag=&title=", lambda i: client.get(
+            f"/list_pages/{WORKSPACE}", params={"tag": "benchmark", "title": tagged_title}
+        )),
+        ("GET /workspace_documents/{workspace}", lambda i: client.get(f"/workspace_documents/{WORKSPACE}")),
+        ("POST /extract_links", lambda i: client.post("/extract_links", json={"workspace": WORKSPACE, "text": queries[i % len(queries)]["text"]})),
+        ("POST /generate_tags", lambda i: client.post("/generate_tags", json={"workspace": WORKSPACE})),
+        ("POST /ask", lambda i: client.post("/ask", json={"workspace": WORKSPACE, "question": queries[i % len(queries)]["question"]})),
+        ("GET /knowledge_graph/{workspace}", lambda i: client.get(f"/knowledge_graph/{WORKSPACE}")),
+        ("DELETE /delete_page/{page_id}", lambda i: client.delete(f"/delete_page/{uploaded.pop()}")),
+        ("GET /metrics", lambda i: client.get("/metrics")),
+        ("POST /admin/profile", arm_profile),
+        ("GET /admin/profile", lambda i: client.get("/admin/profile", params={"route": PROFILED_ROUTE})),
+    ]
+    for endpoint, call in scenarios:
+        if not selected(endpoint):
+            continue
+        if endpoint == "GET /admin/profile":
+            capture_profile(client, arm_profile)
+        if endpoint == "POST /generate_tags":
+            score_workspace_tags(fastapi_module, call)
+        if endpoint == "GET /knowledge_graph/{workspace}" and len(corpus) > args.graph_max_pages:
+            results.append(skipped("fastapi", endpoint, f"more than {args.graph_max_pages} pages"))
+            continue
+        if endpoint == "DELETE /delete_page/{page_id}" and len(uploaded) < args.iterations + args.warmup:
+            results.append(skipped("fastapi", endpoint, "not enough uploaded pages to delete"))
+            continue
+        results.append(measure("fastapi", endpoint, call, args.iterations, args.warmup))
+
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Flask and FastAPI backends on a synthetic workspace")
+    parser.add_argument("--pages", type=int, default=1000, help="number of synthetic pages (100 to 100000)")
+    parser.add_argument("--iterations", type=int, default=20, help="measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured requests per endpoint")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--models", choices=["stub", "real"], default="stub",
+                        help="tiny deterministic stub models, or real models loaded from the local cache only")
+    parser.add_argument("--apps", default="flask,fastapi", help="comma-separated apps to benchmark")
+    parser.add_argument("--only", default="", help="comma-separated substrings; only matching endpoints are reported")
+    parser.add_argument("--graph-max-pages", type=int, default=2000, help="skip the O(n^2) knowledge graph above this size")
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    filters = [f for f in args.only.split(",") if f]
+
+    def selected(endpoint):
+        return not filters or any(f in endpoint for f in filters)
+
+    apps = [name for name in args.apps.split(",") if name]
+    unknown = set(apps) - set(APP_MODULES)
+    if unknown:
+        parser.error(f"unknown app(s): {', '.join(sorted(unknown))}")
+    modules = load_apps(apps, args.models)
+
+    corpus_start = time.perf_counter()
+    corpus = generate_corpus(args.pages, seed=args.seed)
+    queries = generate_queries(max(args.iterations + args.warmup, 1), seed=args.seed)
+    print(f"Generated {len(corpus)} pages in {time.perf_counter() - corpus_start:.1f}s", file=sys.stderr)
+
+    results = []
+    if "flask" in modules:
+        results.extend(run_flask(modules["flask"], corpus, queries, args, selected))
+    if "fastapi" in modules:
+        results.extend(run_fastapi(modules["fastapi"], corpus, queries, args, selected))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "models": args.models,
+            "inference_backends": importlib.import_module("inference").configured_backends(),
+            "pages": args.pages,
+            "corpus_words": sum(len(page["content"].split()) for page in corpus),
+            "iterations": args.iterations,
+            "seed": args.seed,
+        },
+        "results": results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import math
+import re
+import sys
+import types
+import zlib
+import numpy as np
+
+EMBEDDING_DIM = 384
+
+
+def _tokens(text):
+    return re.findall(r"\w+", text.lower())
+
+
+class StubSentenceTransformer:
+    """Deterministic hashed bag-of-words encoder with the SentenceTransformer.encode interface"""
+
+    def __init__(self, model_name_or_path=None, **kwargs):
+        self.model_name = model_name_or_path
+
+    def _encode_one(self, text):
+        vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+        for token in _tokens(text):
+            vector[zlib.crc32(token.encode("utf-8")) % EMBEDDING_DIM] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, sentences, **kwargs):
+        if isinstance(sentences, str):
+            return self._encode_one(sentences)
+        return np.stack([self._encode_one(text) for text in sentences])
+
+
+def _question_answering(question=None, context=None, **kwargs):
+    """Return the context sentence with the most question-word overlap"""
+    question_tokens = set(_tokens(question or ""))
+    best_sentence, best_overlap = "", 0
+    for sentence in re.split(r"(?<=[.!?])\s+", context or ""):
+        overlap = len(question_tokens & set(_tokens(sentence)))
+        if overlap > best_overlap:
+            best_sentence, best_overlap = sentence, overlap
+    score = best_overlap / len(question_tokens) if question_tokens else 0.0
+    start = (context or "").find(best_sentence)
+    return {"answer": best_sentence, "score": score, "start": max(start, 0), "end": max(start, 0) + len(best_sentence)}
+
+
+def _zero_shot_classification(sequences, candidate_labels, **kwargs):
+    """Score labels by how often they (or a crc-stable pseudo-affinity) appear in the text"""
+    tokens = _tokens(sequences)
+    counts = {label: tokens.count(label) for label in candidate_labels}
+    logits = [
+        counts[label] + (zlib.crc32(f"{label}:{len(tokens)}".encode("utf-8")) % 100) / 100.0
+        for label in candidate_labels
+    ]
+    peak = max(logits)
+    exps = [math.exp(logit - peak) for logit in logits]
+    total = sum(exps)
+    ranked = sorted(zip(candidate_labels, (e / total for e in exps)), key=lambda item: item[1], reverse=True)
+    return {"sequence": sequences, "labels": [label for label, _ in ranked], "scores": [score for _, score in ranked]}
+
+
+def _feature_extraction(inputs, **kwargs):
+    return [[StubSentenceTransformer()._encode_one(inputs).tolist()]]
+
+
+_TASKS = {
+    "question-answering": _question_answering,
+    "zero-shot-classification": _zero_shot_classification,
+    "feature-extraction": _feature_extraction,
+}
+
+
+def stub_pipeline(task, model=None, tokenizer=None, **kwargs):
+    """Drop-in for transformers.pipeline returning tiny deterministic models"""
+    if task not in _TASKS:
+        raise ValueError(f"No stub model for task '{task}'")
+    return _TASKS[task]
+
+
+def _patch_or_register(module_name, attribute, stub):
+    """Patch `attribute` on the real module if it imports, otherwise register a stand-in module"""
+    try:
+        module = __import__(module_name)
+    except ImportError:
+        module = sys.modules[module_name] = types.ModuleType(module_name)
+    setattr(module, attribute, stub)
+
+
+def install_stub_models():
+    """Replace model constructors before the apps are imported, so no weights are downloaded or loaded.
+
+    transformers, sentence_transformers and torch need not be installed: missing
+    packages are replaced by stand-in modules exposing only the stub constructors.
+    """
+    _patch_or_register("transformers", "pipeline", stub_pipeline)
+    _patch_or_register("sentence_transformers", "SentenceTransformer", StubSentenceTransformer)
@@ -0,0 +1,151 @@
+import hashlib
+import string
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# MinHash parameters: 64 random bijections of 32-bit shingle hashes, x -> (x ^ b) * a mod 2^32
+# with odd a. Shingles are hashed with Python's str hash, so signatures are only comparable
+# within one process (the indexes live in memory, so that is all they need).
+NUM_PERM = 64
+# 16 bands x 4 rows: the candidate S-curve 1-(1-J^4)^16 has its midpoint near Jaccard 0.5
+# and reaches ~0.99 at 0.7, so pairs above DUPLICATE_THRESHOLD are practically never missed
+LSH_BANDS = 16
+SHINGLE_SIZE = 3
+# Chunks end after shingles whose hash is 0 mod CHUNK_SHINGLES (so ~256 shingles on average),
+# which lines up a shared section in two pages wherever it sits in each of them
+CHUNK_SHINGLES = 256
+MIN_CHUNK_SHINGLES = 64
+MAX_CHUNK_SHINGLES = 1024
+DUPLICATE_THRESHOLD = 0.8
+
+_rng = np.random.RandomState(1)
+_PERM_A = (_rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)).astype(np.uint32)
+_PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64).astype(np.uint32)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+# ASCII punctuation except "_" (a word character) becomes a word break; str.translate is ~4x faster than a regex
+_PUNCTUATION_TO_SPACE = str.maketrans({c: " " for c in string.punctuation if c != "_"})
+
+
+def normalize_words(text):
+    """Lowercased word tokens with ASCII punctuation dropped"""
+    return text.lower().translate(_PUNCTUATION_TO_SPACE).split()
+
+
+def content_fingerprint(words):
+    """Exact fingerprint of normalized words, used to share embeddings between identical content"""
+    return hashlib.sha1(" ".join(words).encode("utf-8")).hexdigest()
+
+
+def _shingle_hashes(words):
+    """32-bit hash per word 3-gram, combined from one hash per word"""
+    if len(words) < SHINGLE_SIZE:
+        words = [" ".join(words)]
+        word_hashes = np.fromiter(map(hash, words), dtype=np.int64, count=1).view(np.uint64)
+        return (word_hashes ^ (word_hashes >> np.uint64(32))).astype(np.uint32)
+
+    word_hashes = np.fromiter(map(hash, words), dtype=np.int64, count=len(words)).view(np.uint64)
+    with np.errstate(over="ignore"):
+        combined = (word_hashes[:-2] * _MIX + word_hashes[1:-1]) * _MIX + word_hashes[2:]
+    return (combined ^ (combined >> np.uint64(32))).astype(np.uint32)
+
+
+def _chunk_bounds(hashes):
+    """Content-defined chunk boundaries over the shingle sequence, kept within MIN/MAX_CHUNK_SHINGLES"""
+    bounds = [0]
+    for cut in (np.flatnonzero(hashes % CHUNK_SHINGLES == 0) + 1).tolist() + [len(hashes)]:
+        while cut - bounds[-1] > MAX_CHUNK_SHINGLES:
+            bounds.append(bounds[-1] + MAX_CHUNK_SHINGLES)
+        if cut - bounds[-1] >= MIN_CHUNK_SHINGLES:
+            bounds.append(cut)
+    if bounds[-1] != len(hashes):
+        # Fold a short tail into the last chunk (or make it the only chunk)
+        if len(bounds) > 1:
+            bounds[-1] = len(hashes)
+        else:
+            bounds.append(len(hashes))
+    return bounds
+
+
+def minhash_signatures(words):
+    """MinHash signatures of the whole text and of each of its chunks.
+
+    Chunks partition the shingles, so the page signature is the element-wise
+    minimum of the chunk signatures; working one chunk at a time keeps the
+    intermediate (shingles x NUM_PERM) matrix small.
+    """
+    hashes = _shingle_hashes(words)
+    bounds = _chunk_bounds(hashes)
+    chunks = []
+    with np.errstate(over="ignore"):
+        for start, stop in zip(bounds, bounds[1:]):
+            batch = hashes[start:stop, None]
+            chunks.append(((batch ^ _PERM_B) * _PERM_A).min(axis=0))
+    return np.minimum.reduce(chunks), chunks
+
+
+class ContentSignature:
+    """Everything near-duplicate detection needs from a text, computed from one normalization pass"""
+    __slots__ = ("fingerprint", "page", "chunks")
+
+    def __init__(self, text):
+        words = normalize_words(text)
+        self.fingerprint = content_fingerprint(words)
+        self.page, self.chunks = minhash_signatures(words)
+
+
+def estimate_similarity(sig_a, sig_b):
+    """Estimate Jaccard similarity from two MinHash signatures"""
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+
+class NearDuplicateIndex:
+    """LSH index over MinHash signatures for sub-linear near-duplicate lookup"""
+
+    def __init__(self, bands=LSH_BANDS, threshold=DUPLICATE_THRESHOLD):
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self.threshold = threshold
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = {}  # key -> signature
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, key, signature):
+        self.signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self.buckets[band].setdefault(band_key, set()).add(key)
+
+    def remove(self, key):
+        """Remove an entry; returns False if the key was not indexed"""
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return False
+        for band, band_key in self._band_keys(signature):
+            bucket = self.buckets[band].get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self.buckets[band][band_key]
+        return True
+
+    def query(self, signature, exclude=None):
+        """Return (key, similarity) of the closest indexed entry above the threshold, or None.
+
+        `exclude(key)` can skip candidates, e.g. other chunks of the page being checked.
+        """
+        candidates = set()
+        for band, band_key in self._band_keys(signature):
+            candidates.update(self.buckets[band].get(band_key, ()))
+
+        best = None
+        for key in candidates:
+            if exclude is not None and exclude(key):
+                continue
+            similarity = estimate_similarity(signature, self.signatures[key])
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (key, similarity)
+        return best
@@ -0,0 +1,151 @@
+import math
+import queue
+import threading
+import time
+import logging
+
+from metrics import timed, count_model_call
+
+logger = logging.getLogger(__name__)
+
+# Predefined tag categories
+CANDIDATE_LABELS = [
+    "meeting", "strategy", "research", "todo", "idea", "project", "documentation",
+    "notes", "planning", "brainstorming", "analysis", "report", "presentation",
+    "technical", "business", "creative", "personal", "urgent", "completed",
+    "in-progress", "review", "collaboration", "learning", "reference"
+]
+
+CHUNK_MIN_CONFIDENCE = 0.3  # Per-chunk score a label needs to count for a document
+TAG_MIN_CONFIDENCE = 0.4  # Aggregated confidence a label needs to become a workspace tag
+RECENCY_HALF_LIFE_DAYS = 30.0
+
+
+def score_chunks(classifier, chunks):
+    """Classify a document's chunks and average each label's confidence over the chunks where it scored above 0.3.
+
+    Classifier errors propagate: the result is stored per document version, so
+    scores from a partly failed run must not be cached as the document's tags.
+    """
+    tag_confidence = {}
+    for chunk in chunks:
+        count_model_call("zero_shot", chunk)
+        with timed("zero_shot_inference"):
+            result = classifier(chunk, CANDIDATE_LABELS)
+
+        for label, score in zip(result['labels'], result['scores']):
+            if score > CHUNK_MIN_CONFIDENCE:
+                tag_confidence.setdefault(label, []).append(score)
+
+    return {label: sum(scores) / len(scores) for label, scores in tag_confidence.items()}
+
+
+def document_weight(length, timestamp, now):
+    """Weight a document by log length, halving every RECENCY_HALF_LIFE_DAYS since its last change"""
+    age_days = max(now - timestamp, 0.0) / 86400.0
+    return math.log1p(length) * 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+
+
+def aggregate_tags(documents, now=None, max_tags=10):
+    """Combine stored per-document tag scores into workspace tags.
+
+    `documents` yields (tag_scores, length, timestamp). A tag's confidence is the
+    weighted mean over the documents that carry it, and its coverage is the share
+    of total weight those documents hold; tags are ranked by confidence x coverage.
+    """
+    now = time.time() if now is None else now
+    total_weight = 0.0
+    support = {}
+    weighted_confidence = {}
+
+    for tag_scores, length, timestamp in documents:
+        weight = document_weight(length, timestamp, now)
+        total_weight += weight
+        for label, confidence in tag_scores.items():
+            support[label] = support.get(label, 0.0) + weight
+            weighted_confidence[label] = weighted_confidence.get(label, 0.0) + weight * confidence
+
+    tags = []
+    for label, label_weight in support.items():
+        if label_weight <= 0:
+            continue
+        confidence = weighted_confidence[label] / label_weight
+        if confidence > TAG_MIN_CONFIDENCE:
+            tags.append({
+                "name": label,
+                "confidence": round(confidence, 3),
+                "coverage": round(label_weight / total_weight, 3),
+                "auto_generated": True
+            })
+
+    tags.sort(key=lambda tag: tag["confidence"] * tag["coverage"], reverse=True)
+    return tags[:max_tags]
+
+
+class DocumentTagCache:
+    """Per-document tag scores keyed by document and version, so each version is classified once"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}  # key -> (version, tag_scores)
+
+    def get(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        return None
+
+    def put(self, key, version, tag_scores):
+        with self.lock:
+            self.entries[key] = (version, tag_scores)
+
+    def prune(self, prefix, live_keys):
+        """Drop entries under a prefix (e.g. a workspace) whose documents no longer exist"""
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == prefix and key not in live_keys]:
+                del self.entries[key]
+
+
+class TagScoringWorker:
+    """Background thread that classifies documents after they are written.
+
+    Workspace tag requests then only aggregate stored scores. `score(item)` does
+    the work for one document and stores the result itself; a key already waiting
+    in the queue is not queued twice.
+    """
+
+    def __init__(self, score):
+        self.score = score
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.queued = set()
+        self.thread = None
+
+    def submit(self, key, item):
+        with self.lock:
+            if key in self.queued:
+                return
+            self.queued.add(key)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="tag-scoring", daemon=True)
+                self.thread.start()
+        self.queue.put((key, item))
+
+    def _run(self):
+        while True:
+            key, item = self.queue.get()
+            # Un-mark before scoring, so an edit that lands meanwhile queues the document again
+            with self.lock:
+                self.queued.discard(key)
+            try:
+                self.score(item)
+            except Exception as e:
+                # Left unscored; the next tag request for the workspace queues it again
+                logger.error(f"Error scoring tags for {key}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def join(self):
+        """Wait until every queued document has been scored"""
+        self.queue.join()
@@ -1,23 +1,39 @@
 
 from fastapi import FastAPI, UploadFile, Form, HTTPException, Depends, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, JSONResponse, Response
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
 from pydantic import BaseModel
 from typing import List, Optional
-from sentence_transformers import SentenceTransformer, util
-from transformers import pipeline
 import uuid
-import faiss
 import os
+import time
+import threading
 import json
 import numpy as np
 import logging
+from dedup import NearDuplicateIndex, ContentSignature
+from metrics import timed, count_model_call, render_metrics, CONTENT_TYPE, start_request_breakdown, finish_request_breakdown
+from profiling import profile_capture, profiled_endpoint, timing_requested, PROFILE_FILENAME
+from singleflight import SingleFlight, request_key
+from inference import load_pipeline, load_sentence_transformer, backend_for
+from page_store import PageRecord, WorkspaceStore
+from doc_tags import score_chunks, aggregate_tags, TagScoringWorker
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class ProfiledRoute(APIRoute):
+    """Route that can be profiled on demand, in whichever thread runs the endpoint"""
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, profiled_endpoint(path, endpoint), **kwargs)
+
 # CORS setup
 app = FastAPI()
+app.router.route_class = ProfiledRoute
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -26,11 +42,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def add_server_timing(request: Request, call_next):
+    if not timing_requested(request.headers, request.query_params):
+        return await call_next(request)
+    
+    token = start_request_breakdown()
+    response = await call_next(request)
+    response.headers["Server-Timing"] = finish_request_breakdown(token)
+    return response
+
 # Models
 try:
-    embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-    qa_pipeline = pipeline("question-answering", model="deepset/roberta-base-squad2")
-    zero_shot_classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+    # Backends are selected per model via KNOWAI_{EMBEDDING,QA,ZERO_SHOT}_BACKEND=torch|int8|onnx
+    embedding_model = load_sentence_transformer("all-MiniLM-L6-v2", backend=backend_for("embedding"))
+    qa_pipeline = load_pipeline("question-answering", "deepset/roberta-base-squad2", backend=backend_for("qa"))
+    zero_shot_classifier = load_pipeline("zero-shot-classification", "facebook/bart-large-mnli", backend=backend_for("zero_shot"))
     logger.info("All models loaded successfully")
 except Exception as e:
     logger.error(f"Error loading models: {e}")
@@ -39,10 +66,15 @@ except Exception as e:
     zero_shot_classifier = None
 
 # In-memory storage (replace with database in production)
-pages = {}  # page_id -> {...}
-workspaces = {}  # workspace_name -> data
-index = faiss.IndexFlatL2(384) if embedding_model else None
-page_ids = []
+pages = {}  # page_id -> PageRecord, for lookups by id across workspaces
+workspaces = {}  # workspace_name -> data, including the workspace's WorkspaceStore
+dedup_indexes = {}  # workspace_name -> NearDuplicateIndex over page signatures
+chunk_indexes = {}  # workspace_name -> NearDuplicateIndex over (page_id, chunk number) signatures
+embedding_cache = {}  # content fingerprint -> [embedding, number of pages holding it]
+embedding_cache_lock = threading.Lock()
+single_flight = SingleFlight()
+
+GRAPH_BLOCK_SCORES = 1 << 22  # Similarity scores held at once while building the graph (16 MB of float32)
 
 class PageInput(BaseModel):
     title: str
@@ -63,57 +95,215 @@ class QuestionInput(BaseModel):
 class AutoLinkInput(BaseModel):
     workspace: str
     text: str
+    collapse_duplicates: bool = True
 
 class TagGenerationInput(BaseModel):
     workspace: str
     content: Optional[str] = None
 
+class ProfileRequestInput(BaseModel):
+    route: str
+    requests: int = 1
+
 def ensure_workspace(workspace_name: str):
     """Ensure workspace exists in memory"""
     if workspace_name not in workspaces:
-        workspaces[workspace_name] = {
+        # setdefault, so concurrent first requests for a workspace all get the same store
+        workspaces.setdefault(workspace_name, {
             "name": workspace_name,
-            "pages": [],
+            "store": WorkspaceStore(),
+            "version": 0,
             "created_at": "2024-01-01"
-        }
+        })
     return workspaces[workspace_name]
 
+def bump_workspace_version(workspace_name: str):
+    """Mark workspace content as changed so coalesced/cached results keyed on the old version are not reused"""
+    workspace = ensure_workspace(workspace_name)
+    with workspace["store"].lock:
+        workspace["version"] += 1
+
+def coalesce(route: str, workspace: str, payload, fn):
+    """Share one computation between concurrent identical requests against the same workspace version"""
+    version = workspaces[workspace]["version"] if workspace in workspaces else 0
+    return single_flight.do(request_key(route, workspace, version, payload), fn)
+
+async def coalesce_async(route: str, workspace: str, payload, fn):
+    """coalesce() for async endpoints: fn runs once in the threadpool and a disconnecting caller doesn't cancel it"""
+    version = workspaces[workspace]["version"] if workspace in workspaces else 0
+    return await single_flight.do_async(request_key(route, workspace, version, payload), lambda: run_in_threadpool(fn))
+
+def acquire_embedding(content: str, fingerprint: str):
+    """Encode content, sharing one reference-counted embedding between pages with identical content.
+
+    Returns (fingerprint, embedding); the page keeps the fingerprint so release_embedding can drop it.
+    """
+    with embedding_cache_lock:
+        entry = embedding_cache.get(fingerprint)
+        if entry is not None:
+            entry[1] += 1
+            return fingerprint, entry[0]
+    
+    count_model_call("embedding", content)
+    with timed("embedding"):
+        embedding = embedding_model.encode(content)
+    with embedding_cache_lock:
+        entry = embedding_cache.setdefault(fingerprint, [embedding, 0])
+        entry[1] += 1
+    return fingerprint, entry[0]
+
+def release_embedding(record: PageRecord):
+    """Drop a page's reference to its cached embedding, evicting the entry once no page holds it"""
+    fingerprint, record.embedding_key = record.embedding_key, None
+    if fingerprint is None:
+        return
+    with embedding_cache_lock:
+        entry = embedding_cache.get(fingerprint)
+        if entry is not None:
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del embedding_cache[fingerprint]
+
+def workspace_pages(workspace_name: str):
+    """Live pages of a workspace in insertion order, without scanning other workspaces"""
+    if workspace_name not in workspaces:
+        return []
+    return workspaces[workspace_name]["store"].pages()
+
+def find_duplicate(workspace_name: str, signature):
+    """Return (page_id, similarity) of a near-duplicate page in the workspace, or None"""
+    dedup_index = dedup_indexes.get(workspace_name)
+    if dedup_index is None:
+        return None
+    match = dedup_index.query(signature)
+    if match is None:
+        return None
+    # Always point at the canonical copy so duplicate chains stay one level deep
+    canonical_id = pages[match[0]].duplicate_of or match[0]
+    return canonical_id, match[1]
+
+def count_duplicate_chunks(workspace_name: str, page_id: str, chunk_signatures):
+    """Number of a page's chunks that near-duplicate a chunk of another page in the workspace"""
+    chunk_index = chunk_indexes.get(workspace_name)
+    if chunk_index is None:
+        return 0
+    same_page = lambda key: key[0] == page_id
+    return sum(chunk_index.query(signature, exclude=same_page) is not None for signature in chunk_signatures)
+
+def index_chunks(workspace_name: str, page_id: str, chunk_signatures):
+    chunk_index = chunk_indexes.setdefault(workspace_name, NearDuplicateIndex())
+    for number, signature in enumerate(chunk_signatures):
+        chunk_index.add((page_id, number), signature)
+
+def unindex_chunks(workspace_name: str, page_id: str):
+    chunk_index = chunk_indexes.get(workspace_name)
+    if chunk_index is None:
+        return
+    number = 0
+    while chunk_index.remove((page_id, number)):
+        number += 1
+
+def release_duplicates(record: PageRecord):
+    """Promote the first duplicate of a removed canonical page and re-point the rest to it"""
+    store = workspaces[record.workspace]["store"]
+    duplicates = sorted((pages[page_id] for page_id in store.duplicates_of(record.id)), key=lambda other: other.row)
+    if not duplicates:
+        return
+    new_canonical = duplicates[0]
+    store.set_duplicate_of(new_canonical, None)
+    new_canonical.duplicate_similarity = None
+    for other in duplicates[1:]:
+        store.set_duplicate_of(other, new_canonical.id)
+
 @app.get("/")
 def root():
     return {"message": "FastAPI backend for AI features is running!"}
 
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
+@app.post("/admin/profile")
+def arm_profiling(data: ProfileRequestInput):
+    """Capture a cProfile for the next N requests to a route (e.g. /knowledge_graph/{workspace})"""
+    if data.requests < 1:
+        raise HTTPException(status_code=400, detail="Invalid request count")
+    try:
+        profile_capture.arm(data.route, data.requests)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return profile_capture.status(data.route)
+
+@app.get("/admin/profile")
+def download_profile(route: str):
+    """Download the captured profile for a route as a pstats file once all requests were captured"""
+    status = profile_capture.status(route)
+    if status is None:
+        raise HTTPException(status_code=404, detail="No profile armed for this route")
+    if not status["done"]:
+        return JSONResponse(status, status_code=202)
+    
+    return Response(
+        content=profile_capture.dump(route),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f"attachment; filename={PROFILE_FILENAME}"}
+    )
+
 @app.post("/add_page")
 def add_page(page: PageInput):
     try:
         page_id = str(uuid.uuid4())
         
         # Ensure workspace exists
-        ensure_workspace(page.workspace)
+        store = ensure_workspace(page.workspace)["store"]
         
-        if embedding_model and index is not None:
-            embedding = embedding_model.encode(page.content)
-        else:
-            embedding = np.random.rand(384)  # Fallback for testing
-        
-        pages[page_id] = {
-            "id": page_id,
-            "title": page.title,
-            "content": page.content,
-            "workspace": page.workspace,
-            "tags": page.tags or [],
-            "embedding": embedding,
-            "created_at": "2024-01-01"
-        }
+        signature = ContentSignature(page.content)
         
-        if index is not None:
-            index.add(embedding.reshape(1, -1))
-        page_ids.append(page_id)
-        
-        # Add to workspace
-        workspaces[page.workspace]["pages"].append(page_id)
+        # Writes to a workspace are serialized so the duplicate check, store and indexes change together
+        with store.lock:
+            duplicate = find_duplicate(page.workspace, signature.page)
+            
+            embedding_key = None
+            if duplicate:
+                # Near-duplicate: share the canonical page's embedding instead of re-encoding
+                embedding = store.embedding(pages[duplicate[0]])
+            elif embedding_model:
+                embedding_key, embedding = acquire_embedding(page.content, signature.fingerprint)
+            else:
+                embedding = np.random.rand(384)  # Fallback for testing
+            
+            record = PageRecord(
+                page_id,
+                page.title,
+                page.content,
+                page.workspace,
+                page.tags or [],
+                duplicate_of=duplicate[0] if duplicate else None,
+                duplicate_similarity=round(duplicate[1], 3) if duplicate else None
+            )
+            record.embedding_key = embedding_key
+            record.duplicate_chunks = count_duplicate_chunks(page.workspace, page_id, signature.chunks)
+            # Add to workspace
+            store.add(record, embedding)
+            pages[page_id] = record
+            
+            dedup_indexes.setdefault(page.workspace, NearDuplicateIndex()).add(page_id, signature.page)
+            index_chunks(page.workspace, page_id, signature.chunks)
+            
+            bump_workspace_version(page.workspace)
         
-        logger.info(f"Added page {page_id} to workspace {page.workspace}")
-        return {"status": "success", "page_id": page_id}
+        if not duplicate:
+            queue_tag_scoring(record)
+        if duplicate:
+            logger.info(f"Added page {page_id} to workspace {page.workspace} as near-duplicate of {duplicate[0]}")
+        else:
+            logger.info(f"Added page {page_id} to workspace {page.workspace}")
+        return {
+            "status": "success",
+            "page_id": page_id,
+            "duplicate_of": duplicate[0] if duplicate else None,
+            "duplicate_chunks": record.duplicate_chunks
+        }
         
     except Exception as e:
         logger.error(f"Error adding page: {e}")
@@ -122,17 +312,50 @@ def add_page(page: PageInput):
 @app.put("/update_page")
 def update_page(update: UpdatePageInput):
     try:
-        if update.page_id not in pages:
+        record = pages.get(update.page_id)
+        if record is None:
             raise HTTPException(status_code=404, detail="Page not found")
 
-        if update.title:
-            pages[update.page_id]["title"] = update.title
-        if update.content:
-            pages[update.page_id]["content"] = update.content
-            if embedding_model:
-                pages[update.page_id]["embedding"] = embedding_model.encode(update.content)
-        if update.tags is not None:
-            pages[update.page_id]["tags"] = update.tags
+        store = workspaces[record.workspace]["store"]
+        signature = ContentSignature(update.content) if update.content else None
+
+        with store.lock:
+            if pages.get(update.page_id) is not record:
+                raise HTTPException(status_code=404, detail="Page not found")
+            
+            if update.title:
+                store.set_title(record, update.title)
+            if update.content:
+                record.content = update.content
+                record.tag_scores = None
+                record.updated_at = time.time()
+                
+                # Re-check duplicate status against the rest of the workspace
+                dedup_index = dedup_indexes.setdefault(record.workspace, NearDuplicateIndex())
+                dedup_index.remove(update.page_id)
+                if record.duplicate_of is None:
+                    release_duplicates(record)
+                duplicate = find_duplicate(record.workspace, signature.page)
+                dedup_index.add(update.page_id, signature.page)
+                store.set_duplicate_of(record, duplicate[0] if duplicate else None)
+                record.duplicate_similarity = round(duplicate[1], 3) if duplicate else None
+                unindex_chunks(record.workspace, update.page_id)
+                record.duplicate_chunks = count_duplicate_chunks(record.workspace, update.page_id, signature.chunks)
+                index_chunks(record.workspace, update.page_id, signature.chunks)
+                
+                release_embedding(record)
+                if duplicate:
+                    store.set_embedding(record, store.embedding(pages[duplicate[0]]))
+                elif embedding_model:
+                    record.embedding_key, embedding = acquire_embedding(update.content, signature.fingerprint)
+                    store.set_embedding(record, embedding)
+            if update.tags is not None:
+                store.set_tags(record, update.tags)
+            
+            bump_workspace_version(record.workspace)
+        
+        if update.content and record.duplicate_of is None:
+            queue_tag_scoring(record)
 
         return {"status": "updated"}
     except Exception as e:
@@ -142,15 +365,28 @@ def update_page(update: UpdatePageInput):
 @app.delete("/delete_page/{page_id}")
 def delete_page(page_id: str):
     try:
-        if page_id not in pages:
+        record = pages.get(page_id)
+        if record is None:
             raise HTTPException(status_code=404, detail="Page not found")
         
-        workspace = pages[page_id]["workspace"]
-        pages.pop(page_id)
+        workspace = record.workspace
+        store = workspaces[workspace]["store"]
         
-        # Remove from workspace
-        if workspace in workspaces and page_id in workspaces[workspace]["pages"]:
-            workspaces[workspace]["pages"].remove(page_id)
+        with store.lock:
+            record = pages.pop(page_id, None)
+            if record is None:
+                raise HTTPException(status_code=404, detail="Page not found")
+            
+            if workspace in dedup_indexes:
+                dedup_indexes[workspace].remove(page_id)
+            unindex_chunks(workspace, page_id)
+            
+            # Remove from workspace (tombstoned, compacted later)
+            store.delete(record)
+            release_embedding(record)
+            if record.duplicate_of is None:
+                release_duplicates(record)
+            bump_workspace_version(workspace)
         
         return {"status": "deleted"}
     except Exception as e:
@@ -158,16 +394,18 @@ def delete_page(page_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/ask")
-def ask_question(query: QuestionInput):
+async def ask_question(query: QuestionInput):
+    return await coalesce_async("/ask", query.workspace, query.dict(), lambda: answer_question(query))
+
+def answer_question(query: QuestionInput):
     try:
         if not qa_pipeline:
             return {"answer": "Question answering model not available"}
         
         # Get all content from workspace
-        workspace_content = []
-        for page_id, page_data in pages.items():
-            if page_data["workspace"] == query.workspace:
-                workspace_content.append(f"Title: {page_data['title']}\nContent: {page_data['content']}")
+        workspace_content = [
+            f"Title: {record.title}\nContent: {record.content}" for record in workspace_pages(query.workspace)
+        ]
         
         if not workspace_content:
             return {"answer": "No content found in the workspace to search through. Please add some documents first."}
@@ -178,7 +416,9 @@ def ask_question(query: QuestionInput):
         if len(context) > 3000:
             context = context[:3000] + "..."
         
-        result = qa_pipeline(question=query.question, context=context)
+        count_model_call("qa", context)
+        with timed("qa_inference"):
+            result = qa_pipeline(question=query.question, context=context)
         
         logger.info(f"Q&A result: {result}")
         return {"answer": result["answer"], "score": result.get("score", 0)}
@@ -190,28 +430,38 @@ def ask_question(query: QuestionInput):
 @app.post("/extract_links")
 def extract_links(data: AutoLinkInput):
     try:
-        if not embedding_model or index is None:
+        if not embedding_model:
             return {"suggestions": []}
         
-        query_embedding = embedding_model.encode(data.text)
+        count_model_call("embedding", data.text)
+        with timed("embedding"):
+            query_embedding = embedding_model.encode(data.text)
         
         # Find similar pages in the workspace
         suggestions = []
-        for page_id, page_data in pages.items():
-            if page_data["workspace"] != data.workspace:
-                continue
-                
-            similarity = float(util.cos_sim(query_embedding, page_data["embedding"]))
+        with timed("index_search"):
+            candidates = []
+            if data.workspace in workspaces:
+                store = workspaces[data.workspace]["store"]
+                # Candidates and their embedding rows must come from the same state of the store
+                with store.lock:
+                    candidates = store.pages()
+                    if data.collapse_duplicates:
+                        candidates = [record for record in candidates if not record.duplicate_of]
+                    if candidates:
+                        similarities = store.similarities(query_embedding, candidates)
             
-            if similarity > 0.3:  # Threshold for relevance
-                suggestions.append({
-                    "id": page_id,
-                    "targetPage": page_data["title"],
-                    "confidence": similarity,
-                    "reason": f"Semantic similarity: {similarity:.2f}",
-                    "preview": page_data["content"][:150] + "..." if len(page_data["content"]) > 150 else page_data["content"],
-                    "type": "semantic" if similarity > 0.6 else "contextual"
-                })
+            if candidates:
+                for record, similarity in zip(candidates, similarities.tolist()):
+                    if similarity > 0.3:  # Threshold for relevance
+                        suggestions.append({
+                            "id": record.id,
+                            "targetPage": record.title,
+                            "confidence": similarity,
+                            "reason": f"Semantic similarity: {similarity:.2f}",
+                            "preview": record.content[:150] + "..." if len(record.content) > 150 else record.content,
+                            "type": "semantic" if similarity > 0.6 else "contextual"
+                        })
         
         # Sort by confidence and return top 5
         suggestions.sort(key=lambda x: x["confidence"], reverse=True)
@@ -221,53 +471,88 @@ def extract_links(data: AutoLinkInput):
         logger.error(f"Error extracting links: {e}")
         return {"suggestions": []}
 
+def workspace_tag_snapshot(workspace_name: str):
+    """(record, content, tag_scores, updated_at) for each live page, read together under the store lock"""
+    if workspace_name not in workspaces:
+        return []
+    store = workspaces[workspace_name]["store"]
+    with store.lock:
+        return [(record, record.content, record.tag_scores, record.updated_at) for record in store.pages()]
+
+def store_tag_scores(record: PageRecord, content: str, tag_scores):
+    """Cache scores on the page unless it was edited while they were computed (they'd be stale)"""
+    with workspaces[record.workspace]["store"].lock:
+        if record.content == content and record.tag_scores is None:
+            record.tag_scores = tag_scores
+
+def score_page_tags(record: PageRecord):
+    """Classify a page's current content in the tag scoring worker"""
+    with workspaces[record.workspace]["store"].lock:
+        if pages.get(record.id) is not record or record.tag_scores is not None:
+            return
+        content = record.content
+    store_tag_scores(record, content, score_chunks(zero_shot_classifier, [content[:1000]]))
+
+tag_scoring = TagScoringWorker(score_page_tags)
+
+def queue_tag_scoring(record: PageRecord):
+    if zero_shot_classifier:
+        tag_scoring.submit(record.id, record)
+
 @app.post("/generate_tags")
 def generate_tags(data: TagGenerationInput):
+    return coalesce("/generate_tags", data.workspace, data.dict(), lambda: compute_tags(data))
+
+def compute_tags(data: TagGenerationInput):
     try:
         if not zero_shot_classifier:
             return {"error": "Auto-tagging model not available"}
         
         # Get content to analyze
         if data.content:
-            content = data.content
-        else:
-            # Analyze all content in workspace
-            workspace_content = []
-            for page_id, page_data in pages.items():
-                if page_data["workspace"] == data.workspace:
-                    workspace_content.append(page_data["content"])
-            content = "\n".join(workspace_content)
-        
-        if not content.strip():
+            if not data.content.strip():
+                return {"tags": [], "message": "No content found to analyze"}
+            
+            # Limit content length
+            content = data.content[:1000]
+            
+            # Keep tags with confidence > 0.3
+            tag_scores = score_chunks(zero_shot_classifier, [content])
+            tags = [
+                {"name": label, "confidence": round(score, 3), "auto_generated": True}
+                for label, score in sorted(tag_scores.items(), key=lambda item: item[1], reverse=True)
+            ]
+            return {
+                "tags": tags[:10],  # Return top 10 tags
+                "total_content_length": len(content)
+            }
+        
+        # Workspace tags aggregate the per-page scores stored by the tag scoring worker; pages it
+        # hasn't scored yet (or failed to) are queued again and reported as pending
+        snapshot = workspace_tag_snapshot(data.workspace)
+        total_length = sum(len(content) for _, content, _, _ in snapshot)
+        if not total_length:
             return {"tags": [], "message": "No content found to analyze"}
         
-        # Predefined tag categories
-        candidate_labels = [
-            "meeting", "strategy", "research", "todo", "idea", "project", "documentation",
-            "notes", "planning", "brainstorming", "analysis", "report", "presentation",
-            "technical", "business", "creative", "personal", "urgent", "completed",
-            "in-progress", "review", "collaboration", "learning", "reference"
-        ]
-        
-        # Limit content length
-        if len(content) > 1000:
-            content = content[:1000]
-        
-        result = zero_shot_classifier(content, candidate_labels)
+        documents = []
+        pending = 0
+        for record, content, tag_scores, updated_at in snapshot:
+            if tag_scores is None:
+                canonical = pages.get(record.duplicate_of) if record.duplicate_of else None
+                tag_scores = canonical.tag_scores if canonical is not None else None
+                if tag_scores is None:
+                    queue_tag_scoring(record)
+                    pending += 1
+                    continue
+            documents.append((tag_scores, len(content), updated_at))
         
-        # Filter tags with confidence > 0.3
-        tags = []
-        for label, score in zip(result['labels'], result['scores']):
-            if score > 0.3:
-                tags.append({
-                    "name": label,
-                    "confidence": round(score, 3),
-                    "auto_generated": True
-                })
+        tags = aggregate_tags(documents)
         
         return {
-            "tags": tags[:10],  # Return top 10 tags
-            "total_content_length": len(content)
+            "tags": tags,
+            "total_content_length": total_length,
+            "documents_analyzed": len(documents),
+            "documents_pending": pending
         }
         
     except Exception as e:
@@ -278,13 +563,12 @@ def generate_tags(data: TagGenerationInput):
 def get_workspace_documents(workspace: str):
     try:
         documents = []
-        for page_id, page_data in pages.items():
-            if page_data["workspace"] == workspace:
-                documents.append({
-                    "id": page_id,
-                    "name": page_data["title"],
-                    "title": page_data["title"]
-                })
+        for record in workspace_pages(workspace):
+            documents.append({
+                "id": record.id,
+                "name": record.title,
+                "title": record.title
+            })
         
         return {"documents": documents}
     except Exception as e:
@@ -292,53 +576,51 @@ def get_workspace_documents(workspace: str):
         return {"documents": []}
 
 @app.get("/list_pages/{workspace}")
-def list_pages(workspace: str):
+def list_pages(workspace: str, tag: Optional[str] = None, title: Optional[str] = None):
     try:
+        if tag is None and title is None:
+            records = workspace_pages(workspace)
+        elif workspace not in workspaces:
+            records = []
+        else:
+            # Filter through the secondary indexes, in insertion order
+            store = workspaces[workspace]["store"]
+            with store.lock:
+                matches = None
+                if tag is not None:
+                    matches = store.pages_with_tag(tag)
+                if title is not None:
+                    matches = store.pages_with_title(title) if matches is None else matches & store.pages_with_title(title)
+                records = sorted((pages[page_id] for page_id in matches), key=lambda record: record.row)
+        
         result = []
-        for page_id, page_data in pages.items():
-            if page_data["workspace"] == workspace:
-                result.append({
-                    "page_id": page_id,
-                    "title": page_data["title"],
-                    "tags": page_data.get("tags", [])
-                })
+        for record in records:
+            result.append({
+                "page_id": record.id,
+                "title": record.title,
+                "tags": record.tags,
+                "duplicate_of": record.duplicate_of,
+                "duplicate_chunks": record.duplicate_chunks
+            })
         return result
     except Exception as e:
         logger.error(f"Error listing pages: {e}")
         return []
 
 @app.get("/knowledge_graph/{workspace}")
-def knowledge_graph(workspace: str):
+def knowledge_graph(workspace: str, collapse_duplicates: bool = True):
+    return coalesce(
+        "/knowledge_graph", workspace, {"collapse_duplicates": collapse_duplicates},
+        lambda: compute_knowledge_graph(workspace, collapse_duplicates)
+    )
+
+def compute_knowledge_graph(workspace: str, collapse_duplicates: bool):
     try:
         if not embedding_model:
             return {"nodes": [], "edges": [], "error": "Embedding model not available"}
         
-        nodes = []
-        edges = []
-        
-        workspace_pages = {pid: data for pid, data in pages.items() if data["workspace"] == workspace}
-        
-        for pid, data in workspace_pages.items():
-            nodes.append({
-                "id": pid,
-                "label": data["title"],
-                "size": len(data["content"]) / 100,  # Node size based on content length
-                "tags": data.get("tags", [])
-            })
-            
-            source_vec = data["embedding"]
-            for other_id, other_data in workspace_pages.items():
-                if other_id == pid:
-                    continue
-                    
-                score = float(util.cos_sim(source_vec, other_data["embedding"]))
-                if score > 0.4:  # Threshold for edge creation
-                    edges.append({
-                        "source": pid,
-                        "target": other_id,
-                        "weight": round(score, 2),
-                        "type": "semantic"
-                    })
+        with timed("graph_build"):
+            nodes, edges = build_knowledge_graph(workspace, collapse_duplicates)
         
         return {"nodes": nodes, "edges": edges}
         
@@ -346,6 +628,57 @@ def knowledge_graph(workspace: str):
         logger.error(f"Error generating knowledge graph: {e}")
         return {"nodes": [], "edges": [], "error": str(e)}
 
+def build_knowledge_graph(workspace: str, collapse_duplicates: bool):
+    """Build graph nodes and semantic-similarity edges for a workspace"""
+    nodes = []
+    edges = []
+    
+    if workspace not in workspaces:
+        return nodes, edges
+    
+    store = workspaces[workspace]["store"]
+    with store.lock:
+        records = store.pages()
+        duplicates = {}
+        if collapse_duplicates:
+            for record in records:
+                if record.duplicate_of:
+                    duplicates.setdefault(record.duplicate_of, []).append(record.id)
+            records = [record for record in records if not record.duplicate_of]
+        # Copies of the rows, so the similarities below are computed without holding the lock
+        embeddings, norms = store.matrix(records)
+    
+    for record in records:
+        nodes.append({
+            "id": record.id,
+            "label": record.title,
+            "size": len(record.content) / 100,  # Node size based on content length
+            "tags": record.tags,
+            "duplicates": duplicates.get(record.id, [])
+        })
+    
+    if not records:
+        return nodes, edges
+    
+    # Pairwise cosine similarities in blocks of rows, so memory stays O(block x n) instead of O(n^2)
+    block_rows = max(1, GRAPH_BLOCK_SCORES // len(records))
+    for start in range(0, len(records), block_rows):
+        stop = min(start + block_rows, len(records))
+        scores = embeddings[start:stop] @ embeddings.T
+        denominator = np.outer(norms[start:stop], norms)
+        scores /= np.maximum(denominator, 1e-8, out=denominator)
+        scores[np.arange(stop - start), np.arange(start, stop)] = 0.0  # No self-edges
+        
+        for row, target in zip(*np.nonzero(scores > 0.4)):  # Threshold for edge creation
+            edges.append({
+                "source": records[start + row].id,
+                "target": records[target].id,
+                "weight": round(float(scores[row, target]), 2),
+                "type": "semantic"
+            })
+    
+    return nodes, edges
+
 @app.get("/workspaces")
 def list_workspaces():
     try:
@@ -0,0 +1,140 @@
+import json
+import os
+from pathlib import Path
+import numpy as np
+import logging
+from transformers import pipeline
+from sentence_transformers import SentenceTransformer
+
+logger = logging.getLogger(__name__)
+
+# Inference backend per model, chosen at startup:
+#   torch - full-precision float32 PyTorch (default)
+#   int8  - dynamic int8 quantization of the Linear layers (PyTorch, CPU)
+#   onnx  - ONNX Runtime graph, exported once into ONNX_CACHE_DIR and loaded from there
+BACKENDS = ("torch", "int8", "onnx")
+MODEL_KEYS = ("qa", "embedding", "zero_shot")
+
+# SentenceTransformer truncates at max_seq_length from sentence_bert_config.json (256 for
+# all-MiniLM-L6-v2), not at the tokenizer's 512; used if that file can't be read
+DEFAULT_MAX_SEQ_LENGTH = 256
+
+ONNX_CACHE_DIR = Path(os.environ.get("KNOWAI_ONNX_CACHE", Path(__file__).parent / ".onnx_cache"))
+
+_ORT_MODEL_CLASSES = {
+    "question-answering": "ORTModelForQuestionAnswering",
+    "zero-shot-classification": "ORTModelForSequenceClassification",
+    "feature-extraction": "ORTModelForFeatureExtraction",
+}
+
+
+def backend_for(model_key):
+    """Read the backend for a model from KNOWAI_<MODEL>_BACKEND (e.g. KNOWAI_ZERO_SHOT_BACKEND=int8)"""
+    backend = os.environ.get(f"KNOWAI_{model_key.upper()}_BACKEND", "torch").lower()
+    if backend not in BACKENDS:
+        logger.warning(f"Unknown inference backend '{backend}' for {model_key}, using torch")
+        return "torch"
+    return backend
+
+
+def configured_backends():
+    return {key: backend_for(key) for key in MODEL_KEYS}
+
+
+def quantize_linear_layers(model):
+    """Dynamically quantize every nn.Linear to int8 weights (activations stay float)"""
+    import torch
+
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _load_onnx_model(task, model_name):
+    """Load an ONNX Runtime model from the local cache, exporting it on first use"""
+    import optimum.onnxruntime
+    from transformers import AutoTokenizer
+
+    model_class = getattr(optimum.onnxruntime, _ORT_MODEL_CLASSES[task])
+    export_dir = ONNX_CACHE_DIR / model_name.replace("/", "--")
+
+    if (export_dir / "model.onnx").exists():
+        ort_model = model_class.from_pretrained(export_dir)
+        tokenizer = AutoTokenizer.from_pretrained(export_dir)
+    else:
+        logger.info(f"Exporting {model_name} to ONNX in {export_dir}")
+        ort_model = model_class.from_pretrained(model_name, export=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        ort_model.save_pretrained(export_dir)
+        tokenizer.save_pretrained(export_dir)
+    return ort_model, tokenizer
+
+
+def load_pipeline(task, model_name, backend="torch", **kwargs):
+    """Build a transformers pipeline for the given task on the selected inference backend"""
+    if backend == "onnx":
+        try:
+            ort_model, tokenizer = _load_onnx_model(task, model_name)
+            logger.info(f"Loaded {model_name} with ONNX Runtime")
+            return pipeline(task, model=ort_model, tokenizer=tokenizer)
+        except ImportError:
+            logger.error("ONNX backend requested but optimum[onnxruntime] is not installed, using torch")
+
+    pipe = pipeline(task, model=model_name, **kwargs)
+    if backend == "int8":
+        pipe.model = quantize_linear_layers(pipe.model)
+        logger.info(f"Quantized {model_name} Linear layers to int8")
+    return pipe
+
+
+def _max_seq_length(model_name):
+    """max_seq_length from the model's sentence_bert_config.json (local Hugging Face cache first)"""
+    try:
+        from huggingface_hub import hf_hub_download
+
+        with open(hf_hub_download(model_name, "sentence_bert_config.json"), encoding="utf-8") as f:
+            return int(json.load(f)["max_seq_length"])
+    except Exception as e:
+        logger.warning(f"Could not read max_seq_length for {model_name}, using {DEFAULT_MAX_SEQ_LENGTH}: {e}")
+        return DEFAULT_MAX_SEQ_LENGTH
+
+
+class OnnxSentenceEncoder:
+    """ONNX Runtime replacement for SentenceTransformer.encode (mean pooling + L2 normalization)"""
+
+    def __init__(self, model_name):
+        self.model, self.tokenizer = _load_onnx_model("feature-extraction", model_name)
+        self.max_seq_length = _max_seq_length(model_name)
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        embeddings = []
+        for start in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(
+                texts[start:start + batch_size], padding=True, truncation=True,
+                max_length=self.max_seq_length, return_tensors="np"
+            )
+            token_embeddings = self.model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            embeddings.append(pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None))
+
+        result = np.concatenate(embeddings).astype(np.float32)
+        return result[0] if single else result
+
+
+def load_sentence_transformer(model_name, backend="torch"):
+    """Load a sentence embedding model on the selected inference backend"""
+    if backend == "onnx":
+        try:
+            encoder = OnnxSentenceEncoder(model_name if "/" in model_name else f"sentence-transformers/{model_name}")
+            logger.info(f"Loaded {model_name} with ONNX Runtime")
+            return encoder
+        except ImportError:
+            logger.error("ONNX backend requested but optimum[onnxruntime] is not installed, using torch")
+
+    model = SentenceTransformer(model_name)
+    if backend == "int8":
+        model = quantize_linear_layers(model)
+        logger.info(f"Quantized {model_name} Linear layers to int8")
+    return model
@@ -0,0 +1,139 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+
+# Per-request stage/model-call breakdown, only populated when a request opts in
+_request_breakdown = ContextVar("request_breakdown", default=None)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels, rendered in Prometheus text format"""
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels, rendered in Prometheus text format"""
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.values = {}  # label values -> [bucket counts, sum, count]
+        self.lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (bucket_counts, total, count) in sorted(self.values.items()):
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, ('le', bound))} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, ('le', '+Inf'))} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+STAGE_LATENCY = Histogram("knowai_stage_duration_seconds", "Time spent in each processing stage", labels=("stage",))
+ITEMS_PROCESSED = Counter("knowai_items_processed_total", "Chunks and words fed through the pipeline", labels=("kind",))
+MODEL_CALLS = Counter("knowai_model_calls_total", "Number of model invocations", labels=("model",))
+COALESCED_REQUESTS = Counter("knowai_coalesced_requests_total", "Requests that shared an identical in-flight computation", labels=("route",))
+
+
+@contextmanager
+def timed(stage):
+    """Record the duration of the enclosed block under the given stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.observe(elapsed, stage=stage)
+        breakdown = _request_breakdown.get()
+        if breakdown is not None:
+            breakdown["stages"][stage] = breakdown["stages"].get(stage, 0.0) + elapsed
+
+
+def count_model_call(model, chunk=None):
+    """Count one model invocation and, if given, the chunk it processed"""
+    MODEL_CALLS.inc(model=model)
+    breakdown = _request_breakdown.get()
+    if breakdown is not None:
+        breakdown["model_calls"][model] = breakdown["model_calls"].get(model, 0) + 1
+    if chunk is not None:
+        ITEMS_PROCESSED.inc(kind="chunks")
+        ITEMS_PROCESSED.inc(len(chunk.split()), kind="words")
+
+
+def render_metrics():
+    """Render every registered metric in Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def start_request_breakdown():
+    """Start collecting a timing breakdown for the current request; returns a token for finish_request_breakdown"""
+    breakdown = {"start": time.perf_counter(), "stages": {}, "model_calls": {}}
+    return _request_breakdown.set(breakdown)
+
+
+def finish_request_breakdown(token):
+    """Stop collecting and return the breakdown as a Server-Timing header value"""
+    breakdown = _request_breakdown.get()
+    _request_breakdown.reset(token)
+    total = time.perf_counter() - breakdown["start"]
+
+    entries = [f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in breakdown["stages"].items()]
+    entries.extend(f'model-{model};desc="{calls} calls"' for model, calls in breakdown["model_calls"].items())
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
@@ -0,0 +1,184 @@
+import threading
+import time
+import numpy as np
+
+EMBEDDING_DIM = 384
+INITIAL_CAPACITY = 64
+COMPACT_MIN_TOMBSTONES = 64
+
+
+class PageRecord:
+    """Compact page record; the embedding lives in the workspace store's matrix at `row`"""
+    __slots__ = (
+        "id", "title", "content", "workspace", "tags", "row", "duplicate_of", "duplicate_similarity",
+        "duplicate_chunks", "embedding_key", "tag_scores", "created_at", "updated_at"
+    )
+
+    def __init__(self, page_id, title, content, workspace, tags, duplicate_of=None, duplicate_similarity=None, created_at="2024-01-01"):
+        self.id = page_id
+        self.title = title
+        self.content = content
+        self.workspace = workspace
+        self.tags = tags
+        self.row = -1
+        self.duplicate_of = duplicate_of
+        self.duplicate_similarity = duplicate_similarity
+        self.duplicate_chunks = 0  # chunks that near-duplicated another page's chunk when this content was ingested
+        self.embedding_key = None  # fingerprint of the shared cached embedding this page holds a reference to
+        self.tag_scores = None  # label -> confidence, computed once per content version
+        self.created_at = created_at
+        self.updated_at = time.time()
+
+
+class WorkspaceStore:
+    """Pages of one workspace: row-ordered records, a contiguous embedding matrix and tag/title indexes.
+
+    Deletes leave a tombstone (None) in the row list and are compacted away once
+    tombstones outnumber live rows, so deletion is O(1) amortized.
+
+    Every method holds `lock`; callers that need several calls to see one state
+    (e.g. pages() followed by matrix(), or a multi-step page update) hold it too.
+    """
+
+    def __init__(self, dim=EMBEDDING_DIM):
+        self.lock = threading.RLock()
+        self.records = []  # row -> PageRecord, or None for a deleted row
+        self.embeddings = np.zeros((INITIAL_CAPACITY, dim), dtype=np.float32)
+        self.norms = np.zeros(INITIAL_CAPACITY, dtype=np.float32)
+        self.by_tag = {}  # tag -> set of page ids
+        self.by_title = {}  # title -> list of page ids (titles are mostly unique, a list is smaller than a set)
+        self.duplicates = {}  # canonical page id -> set of ids of the pages marked as its duplicates
+        self.live = 0
+        self.tombstones = 0
+
+    def __len__(self):
+        return self.live
+
+    def _index(self, index, key, page_id):
+        index.setdefault(key, set()).add(page_id)
+
+    def _unindex(self, index, key, page_id):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(page_id)
+            if not ids:
+                del index[key]
+
+    def add(self, record, embedding):
+        with self.lock:
+            row = len(self.records)
+            if row == len(self.embeddings):
+                # Grow by 1/8 so amortized appends stay O(1) without doubling the slack memory
+                extra = max(INITIAL_CAPACITY, len(self.embeddings) // 8)
+                self.embeddings = np.concatenate([self.embeddings, np.zeros((extra, self.embeddings.shape[1]), dtype=np.float32)])
+                self.norms = np.concatenate([self.norms, np.zeros(extra, dtype=np.float32)])
+            # Write the row before publishing the record, so a bad embedding can't leave a record without one
+            self._write_row(row, embedding)
+            record.row = row
+            self.records.append(record)
+            self.by_title.setdefault(record.title, []).append(record.id)
+            for tag in record.tags:
+                self._index(self.by_tag, tag, record.id)
+            if record.duplicate_of is not None:
+                self._index(self.duplicates, record.duplicate_of, record.id)
+            self.live += 1
+
+    def _write_row(self, row, embedding):
+        self.embeddings[row] = embedding
+        self.norms[row] = np.linalg.norm(self.embeddings[row])
+
+    def set_embedding(self, record, embedding):
+        with self.lock:
+            self._write_row(record.row, embedding)
+
+    def embedding(self, record):
+        with self.lock:
+            return self.embeddings[record.row].copy()
+
+    def _unindex_title(self, record):
+        ids = self.by_title.get(record.title)
+        if ids is not None and record.id in ids:
+            ids.remove(record.id)
+            if not ids:
+                del self.by_title[record.title]
+
+    def set_title(self, record, title):
+        with self.lock:
+            self._unindex_title(record)
+            record.title = title
+            self.by_title.setdefault(title, []).append(record.id)
+
+    def set_tags(self, record, tags):
+        with self.lock:
+            for tag in record.tags:
+                self._unindex(self.by_tag, tag, record.id)
+            record.tags = tags
+            for tag in tags:
+                self._index(self.by_tag, tag, record.id)
+
+    def set_duplicate_of(self, record, canonical_id):
+        with self.lock:
+            if record.duplicate_of is not None:
+                self._unindex(self.duplicates, record.duplicate_of, record.id)
+            record.duplicate_of = canonical_id
+            if canonical_id is not None:
+                self._index(self.duplicates, canonical_id, record.id)
+
+    def duplicates_of(self, page_id):
+        with self.lock:
+            return set(self.duplicates.get(page_id, ()))
+
+    def delete(self, record):
+        with self.lock:
+            self.set_tags(record, [])
+            self._unindex_title(record)
+            if record.duplicate_of is not None:
+                self._unindex(self.duplicates, record.duplicate_of, record.id)
+            self.records[record.row] = None
+            self.live -= 1
+            self.tombstones += 1
+            if self.tombstones >= COMPACT_MIN_TOMBSTONES and self.tombstones > self.live:
+                self.compact()
+
+    def compact(self):
+        """Drop tombstoned rows and pack the embedding matrix, keeping insertion order"""
+        with self.lock:
+            rows = [row for row, record in enumerate(self.records) if record is not None]
+            capacity = max(INITIAL_CAPACITY, len(rows) + len(rows) // 8)
+            embeddings = np.zeros((capacity, self.embeddings.shape[1]), dtype=np.float32)
+            norms = np.zeros(capacity, dtype=np.float32)
+            embeddings[:len(rows)] = self.embeddings[rows]
+            norms[:len(rows)] = self.norms[rows]
+
+            self.records = [self.records[row] for row in rows]
+            for new_row, record in enumerate(self.records):
+                record.row = new_row
+            self.embeddings = embeddings
+            self.norms = norms
+            self.tombstones = 0
+
+    def pages(self):
+        """Live records in insertion order"""
+        with self.lock:
+            return [record for record in self.records if record is not None]
+
+    def pages_with_tag(self, tag):
+        with self.lock:
+            return set(self.by_tag.get(tag, ()))
+
+    def pages_with_title(self, title):
+        with self.lock:
+            return set(self.by_title.get(title, ()))
+
+    def matrix(self, records):
+        """Embeddings and norms of the given records as contiguous arrays (copies, safe to use unlocked)"""
+        with self.lock:
+            rows = [record.row for record in records]
+            return self.embeddings[rows], self.norms[rows]
+
+    def similarities(self, query_embedding, records):
+        """Cosine similarity of a query against the given records in one matrix product"""
+        embeddings, norms = self.matrix(records)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        denominator = np.maximum(norms * np.linalg.norm(query), 1e-8)
+        return embeddings @ query / denominator
@@ -0,0 +1,103 @@
+import cProfile
+import functools
+import inspect
+import marshal
+import pstats
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+TIMING_HEADER = "X-Debug-Timing"
+PROFILE_FILENAME = "profile.pstats"
+
+
+def timing_requested(headers, args):
+    """Whether the caller opted into a Server-Timing breakdown via header or ?timing=1"""
+    flag = headers.get(TIMING_HEADER) or args.get("timing")
+    return flag is not None and flag.lower() in ("1", "true", "yes")
+
+
+class ProfileCapture:
+    """Captures cProfile stats for the next N requests to a route"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.captures = {}  # route -> {"requested", "remaining", "completed", "stats"}
+        self.unprofilable = set()  # async routes, see profiled_endpoint
+
+    def arm(self, route, requests):
+        if route in self.unprofilable:
+            raise ValueError(f"Route {route} runs on the event loop and can't be profiled per request")
+        with self.lock:
+            self.captures[route] = {"requested": requests, "remaining": requests, "completed": 0, "stats": None}
+        logger.info(f"Profiling armed for next {requests} request(s) to {route}")
+
+    def start(self, route):
+        """Return a running profiler if this request should be captured, else None"""
+        with self.lock:
+            capture = self.captures.get(route)
+            if capture is None or capture["remaining"] <= 0:
+                return None
+            capture["remaining"] -= 1
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def finish(self, route, profile):
+        profile.disable()
+        with self.lock:
+            capture = self.captures.get(route)
+            if capture is None:
+                return
+            capture["completed"] += 1
+            if capture["stats"] is None:
+                capture["stats"] = pstats.Stats(profile)
+            else:
+                capture["stats"].add(profile)
+
+    def status(self, route):
+        with self.lock:
+            capture = self.captures.get(route)
+            if capture is None:
+                return None
+            return {
+                "route": route,
+                "requested": capture["requested"],
+                "captured": capture["completed"],
+                "done": capture["completed"] >= capture["requested"]
+            }
+
+    def dump(self, route):
+        """Return the collected stats in pstats file format, or None if nothing was captured yet"""
+        with self.lock:
+            capture = self.captures.get(route)
+            if capture is None or capture["stats"] is None:
+                return None
+            return marshal.dumps(capture["stats"].stats)
+
+
+profile_capture = ProfileCapture()
+
+
+def profiled_endpoint(route, endpoint):
+    """Wrap a sync endpoint so it is profiled in the threadpool thread that actually runs it.
+
+    Async endpoints are left unwrapped and can't be armed: a profiler enabled on the
+    event loop thread across an await records every other coroutine that runs
+    meanwhile, and a second capture on the loop would replace the first one's hook.
+    """
+    if inspect.iscoroutinefunction(endpoint):
+        profile_capture.unprofilable.add(route)
+        return endpoint
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profile = profile_capture.start(route)
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profile_capture.finish(route, profile)
+    return wrapper
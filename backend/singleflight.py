@@ -0,0 +1,80 @@
+import asyncio
+import hashlib
+import json
+import threading
+import logging
+
+from metrics import COALESCED_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+
+def request_key(route, workspace, version, payload=None):
+    """Key identical requests by route, workspace, workspace version and normalized payload"""
+    normalized = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return (route, workspace, version, hashlib.sha1(normalized.encode("utf-8")).hexdigest())
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent identical requests so only one computes and the rest share its result"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}  # key -> _Call, for sync endpoints running in the threadpool
+        self.async_calls = {}  # key -> asyncio.Task, only touched from the event loop thread
+
+    def do(self, key, fn):
+        """Run fn() for this key unless an identical call is already in flight, then wait for it"""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+
+        if not leader:
+            COALESCED_REQUESTS.inc(route=key[0])
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.event.set()
+
+    async def do_async(self, key, make_coro):
+        """Async counterpart of do(): the first caller starts make_coro() as its own task.
+
+        Every caller, the first one included, awaits that task through asyncio.shield,
+        so a caller whose client disconnects is cancelled on its own while the
+        computation keeps running for the others.
+        """
+        task = self.async_calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(make_coro())
+            self.async_calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            COALESCED_REQUESTS.inc(route=key[0])
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self.async_calls.get(key) is task:
+            del self.async_calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved in case every caller was cancelled before it finished
+            task.exception()
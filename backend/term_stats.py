@@ -0,0 +1,101 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+import logging
+
+logger = logging.getLogger(__name__)
+
+STOP_WORDS = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him', 'her', 'us', 'them'}
+
+SUPPORTED_EXTENSIONS = [".txt", ".md"]
+
+
+def term_counts(text):
+    """Count keyword candidates in text (words longer than 3 characters, stop words removed)"""
+    cleaned_text = re.sub(r'[^\w\s]', ' ', text.lower())
+    return Counter(word for word in cleaned_text.split() if len(word) > 3 and word not in STOP_WORDS)
+
+
+def rank_keywords(term_freq, doc_freq, num_docs, max_keywords=10):
+    """Rank terms by TF-IDF (smoothed IDF, so a single document falls back to raw counts)"""
+    scored = (
+        (count * (math.log((1 + num_docs) / (1 + doc_freq.get(term, 0))) + 1), term)
+        for term, count in term_freq.items()
+    )
+    # O(V log k) selection instead of sorting the whole vocabulary
+    return heapq.nsmallest(max_keywords, scored, key=lambda item: (-item[0], item[1]))
+
+
+class WorkspaceTermStats:
+    """Term and document frequencies for one workspace, updated file by file"""
+
+    def __init__(self):
+        self.lock = threading.Lock()  # per workspace, so one workspace's disk I/O doesn't block the others
+        self.files = {}  # file name -> (version, Counter)
+        self.term_freq = Counter()
+        self.doc_freq = Counter()
+
+    @property
+    def num_docs(self):
+        return len(self.files)
+
+    def _remove(self, name):
+        _, counts = self.files.pop(name)
+        self.term_freq.subtract(counts)
+        self.doc_freq.subtract(counts.keys())
+        # Drop terms that no longer occur so the counters don't grow without bound
+        for term in counts:
+            if self.term_freq[term] <= 0:
+                del self.term_freq[term]
+            if self.doc_freq[term] <= 0:
+                del self.doc_freq[term]
+
+    def _add(self, name, version, counts):
+        self.files[name] = (version, counts)
+        self.term_freq.update(counts)
+        self.doc_freq.update(counts.keys())
+
+    def refresh(self, workspace_path):
+        """Re-count only files that were added or changed since the last refresh"""
+        seen = set()
+        for file in workspace_path.iterdir():
+            if not (file.is_file() and file.suffix.lower() in SUPPORTED_EXTENSIONS):
+                continue
+            stat = file.stat()
+            version = (stat.st_mtime_ns, stat.st_size)
+            seen.add(file.name)
+
+            cached = self.files.get(file.name)
+            if cached is not None and cached[0] == version:
+                continue
+            try:
+                with open(file, "r", encoding="utf-8") as f:
+                    counts = term_counts(f.read())
+            except Exception as e:
+                logger.error(f"Failed to read file {file.name}: {e}")
+                continue
+
+            if cached is not None:
+                self._remove(file.name)
+            self._add(file.name, version, counts)
+
+        for name in [name for name in self.files if name not in seen]:
+            self._remove(name)
+
+
+_workspace_stats = {}  # workspace path -> WorkspaceTermStats
+
+
+def workspace_keywords(workspace_path, max_keywords=10):
+    """Return TF-IDF ranked (score, term) pairs for a workspace, reusing cached per-file counts"""
+    key = str(workspace_path)
+    stats = _workspace_stats.get(key)
+    if stats is None:
+        # setdefault, so concurrent first requests for a workspace share one instance
+        stats = _workspace_stats.setdefault(key, WorkspaceTermStats())
+    with stats.lock:
+        if workspace_path.exists():
+            stats.refresh(workspace_path)
+        return rank_keywords(stats.term_freq, stats.doc_freq, stats.num_docs, max_keywords), stats.num_docs